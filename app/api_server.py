@@ -0,0 +1,425 @@
+"""Standalone asyncio HTTP API for the transcription pipeline.
+
+Run with ``python app/api_server.py``. Endpoints:
+
+    POST /jobs?model=...&mode=...    upload a file (multipart field "file", or a raw /
+                                     chunked body with ?filename=...), returns a job id.
+                                     model is one of WHISPER_MODELS_BY_ACCURACY, or
+                                     model=auto&deadline=<seconds> picks the model when
+                                     the job starts, based on measured speed and load;
+                                     incremental=1 reuses transcripts of unchanged chunks;
+                                     profile=1 saves stage profiles in the job directory
+    GET  /jobs/{id}                  job status
+    GET  /jobs/{id}/events           progress as Server-Sent Events
+    GET  /jobs/{id}/result.srt       generated subtitles
+    GET  /jobs/{id}/result.json      segments, full text and language
+    GET  /search?q=...               cues of finished transcripts matching a query, with
+                                     start/end in milliseconds (limit, offset, order=recent)
+
+Uploads larger than API_MAX_UPLOAD_SIZE MB are rejected (413). Finished jobs
+and their files are removed API_JOB_TTL_SECONDS after they finish.
+
+Jobs run in a pool of API_WORKERS threads, but the process holds one Whisper
+model at a time (see model_scheduler.ModelGate): jobs on different models take
+turns. Run one API process per model for parallelism across models.
+"""
+import asyncio
+import json
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from pipeline import run_pipeline
+from profiling import profiler_for_job
+from transcript_index import get_transcript_index, index_transcript
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import (
+    API_HOST, API_JOB_TTL_SECONDS, API_MAX_UPLOAD_SIZE, API_PORT, API_WORKERS, SUPPORTED_FORMATS, TEMP_DIR,
+    UPLOAD_CHUNK_SIZE, WHISPER_MODEL, WHISPER_MODELS_BY_ACCURACY
+)
+
+JOBS_DIR = TEMP_DIR / "jobs"
+TIMESTAMP_MODES = ("sentence", "word", "word_precise", "word_lazy")
+SSE_KEEPALIVE_SECONDS = 15.0
+# Only known models: the name goes to path_or_hf_repo, which would download any repo or load any path
+ALLOWED_MODELS = frozenset(WHISPER_MODELS_BY_ACCURACY) | {WHISPER_MODEL, "auto"}
+
+
+class Job:
+    """A single transcription request and its progress history."""
+
+    def __init__(self, job_id: str, filename: str, model_name: str, mode: str,
+                 deadline_seconds: Optional[float] = None, incremental: bool = False,
+                 profile: bool = False):
+        self.id = job_id
+        self.filename = filename
+        self.model_name = model_name
+        self.mode = mode
+        self.deadline_seconds = deadline_seconds
+        self.incremental = incremental
+        self.profile = profile
+        self.status = "queued"
+        self.progress = 0
+        self.message = ""
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict] = []
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def directory(self) -> Path:
+        return JOBS_DIR / self.id
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "model": self.model_name,
+            "mode": self.mode,
+            "deadline_seconds": self.deadline_seconds,
+            "incremental": self.incremental,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def publish(self, status: Optional[str] = None, progress: Optional[int] = None,
+                message: str = "", error: Optional[str] = None) -> None:
+        """Record a progress event and wake up SSE subscribers (event loop thread only)."""
+        if status:
+            self.status = status
+        if progress is not None:
+            self.progress = progress
+        if message:
+            self.message = message
+        if error:
+            self.error = error
+        if self.done:
+            self.finished_at = time.time()
+
+        self.events.append({
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+        })
+
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def stream_events(self, start: int = 0) -> AsyncIterator[Tuple[int, Optional[Dict]]]:
+        """Yield (index, event) pairs from ``start`` on, and (index, None) as keepalive ticks."""
+        index = start
+        while True:
+            while index < len(self.events):
+                yield index, self.events[index]
+                index += 1
+            if self.done:
+                return
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield index, None
+
+
+JOBS_KEY = web.AppKey("jobs", Dict[str, Job])
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+# Optional factory(model_name) -> decoding backend, replacing mlx_whisper (load tests)
+BACKEND_FACTORY_KEY = web.AppKey("backend_factory", Optional[Callable])
+EVICTION_TASK_KEY = web.AppKey("eviction_task", asyncio.Task)
+
+
+def run_job(job: Job, input_path: Path, emit, backend_factory: Optional[Callable] = None) -> None:
+    """Run the pipeline for a job and write its results. Blocking; runs in the worker pool."""
+    output = run_pipeline(
+        input_path,
+        model_name=job.model_name,
+        mode=job.mode,
+        progress_callback=emit,
+        deadline_seconds=job.deadline_seconds,
+        submitted_at=job.created_at,
+        incremental=job.incremental,
+        profiler=profiler_for_job(job.profile, job.directory / "profile"),
+        backend=backend_factory(job.model_name) if backend_factory else None
+    )
+    job.model_name = output["model"]
+
+    (job.directory / "result.srt").write_text(output["srt"], encoding="utf-8")
+    (job.directory / "result.json").write_text(json.dumps({
+        "text": output["text"],
+        "language": output["language"],
+        "segments": output["segments"],
+        "loop_guard": output["loop_guard"],
+        "incremental": output["incremental"],
+    }, ensure_ascii=False), encoding="utf-8")
+    index_transcript(f"api:{job.id}", job.filename, output["cues"], duration=output["duration"],
+                     model=output["model"], mode=output["mode"], language=output["language"])
+
+
+async def process_job(app: web.Application, job: Job, input_path: Path) -> None:
+    """Offload the pipeline to the worker pool and relay its progress to the job."""
+    loop = asyncio.get_running_loop()
+
+    def emit(status, progress, message):
+        loop.call_soon_threadsafe(job.publish, status, progress, message)
+
+    try:
+        await loop.run_in_executor(app[EXECUTOR_KEY], run_job, job, input_path, emit, app[BACKEND_FACTORY_KEY])
+        job.publish("completed", 100, "Transcription complete")
+    except Exception as e:
+        job.publish("failed", message="Job failed", error=str(e))
+
+
+def _validate_filename(filename: Optional[str]) -> str:
+    if not filename:
+        raise web.HTTPBadRequest(text="Missing file name")
+    filename = Path(filename).name
+    extension = Path(filename).suffix.lower().lstrip(".")
+    if extension not in SUPPORTED_FORMATS:
+        raise web.HTTPUnsupportedMediaType(text=f"Unsupported file format: {extension or filename}")
+    return filename
+
+
+async def receive_upload(request: web.Request, job_id: str,
+                         max_bytes: int = API_MAX_UPLOAD_SIZE * 1024 * 1024) -> Tuple[str, Path]:
+    """Stream the request body to disk chunk by chunk without buffering it in memory."""
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise web.HTTPRequestEntityTooLarge(max_bytes, request.content_length)
+    job_dir = JOBS_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        while True:
+            part = await reader.next()
+            if part is None:
+                raise web.HTTPBadRequest(text="Missing 'file' field")
+            if part.name == "file":
+                break
+        filename = _validate_filename(part.filename)
+        chunks = _iter_part(part)
+    else:
+        filename = _validate_filename(
+            request.query.get("filename") or request.headers.get("X-Filename")
+        )
+        chunks = request.content.iter_chunked(UPLOAD_CHUNK_SIZE)
+
+    # Job id in the stem keeps extract_audio's output path unique per job
+    input_path = job_dir / f"{job_id}{Path(filename).suffix.lower()}"
+    loop = asyncio.get_running_loop()
+    size = 0
+    with open(input_path, "wb") as f:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                # Chunked bodies have no Content-Length to check up front
+                raise web.HTTPRequestEntityTooLarge(max_bytes, size)
+            # Disk writes block; keep them off the event loop serving the other clients
+            await loop.run_in_executor(None, f.write, chunk)
+
+    if size == 0:
+        raise web.HTTPBadRequest(text="Empty upload")
+    return filename, input_path
+
+
+async def _iter_part(part) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await part.read_chunk(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _get_job(request: web.Request) -> Job:
+    job = request.app[JOBS_KEY].get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text="Unknown job")
+    return job
+
+
+async def create_job(request: web.Request) -> web.Response:
+    model_name = request.query.get("model", WHISPER_MODEL)
+    if model_name not in ALLOWED_MODELS:
+        raise web.HTTPBadRequest(text=f"Invalid model: {model_name}")
+    mode = request.query.get("mode", "sentence")
+    if mode not in TIMESTAMP_MODES:
+        raise web.HTTPBadRequest(text=f"Invalid mode: {mode}")
+    deadline_seconds = None
+    if model_name == "auto":
+        try:
+            deadline_seconds = float(request.query["deadline"])
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest(text="model=auto requires a numeric 'deadline' in seconds")
+
+    job_id = uuid.uuid4().hex
+    try:
+        filename, input_path = await receive_upload(request, job_id)
+    except BaseException:
+        shutil.rmtree(JOBS_DIR / job_id, ignore_errors=True)
+        raise
+
+    incremental = request.query.get("incremental", "").lower() in ("1", "true", "yes")
+    profile = request.query.get("profile", "").lower() in ("1", "true", "yes")
+    job = Job(job_id, filename, model_name, mode, deadline_seconds, incremental, profile)
+    job.publish("queued", 0, "Waiting for a free worker")
+    request.app[JOBS_KEY][job_id] = job
+    job.task = asyncio.create_task(process_job(request.app, job, input_path))
+
+    return web.json_response({
+        **job.to_dict(),
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+        "srt_url": f"/jobs/{job_id}/result.srt",
+        "json_url": f"/jobs/{job_id}/result.json",
+    }, status=202)
+
+
+async def get_job(request: web.Request) -> web.Response:
+    return web.json_response(_get_job(request).to_dict())
+
+
+async def job_events(request: web.Request) -> web.StreamResponse:
+    job = _get_job(request)
+    try:
+        start = int(request.headers.get("Last-Event-ID", "-1")) + 1
+    except ValueError:
+        start = 0
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+
+    async for index, event in job.stream_events(start):
+        if event is None:
+            payload = ": keepalive\n\n"
+        else:
+            payload = f"id: {index}\nevent: {event['status']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        await response.write(payload.encode("utf-8"))
+
+    await response.write_eof()
+    return response
+
+
+def _result_response(request: web.Request, filename: str, content_type: str) -> web.FileResponse:
+    job = _get_job(request)
+    if job.status == "failed":
+        raise web.HTTPConflict(text=f"Job failed: {job.error}")
+    if job.status != "completed":
+        raise web.HTTPConflict(text=f"Job is {job.status}")
+    stem = Path(job.filename).stem
+    extension = Path(filename).suffix
+    return web.FileResponse(job.directory / filename, headers={
+        "Content-Type": content_type,
+        "Content-Disposition": f'attachment; filename="{stem}{extension}"',
+    })
+
+
+async def get_srt(request: web.Request) -> web.FileResponse:
+    return _result_response(request, "result.srt", "application/x-subrip; charset=utf-8")
+
+
+async def get_json(request: web.Request) -> web.FileResponse:
+    return _result_response(request, "result.json", "application/json; charset=utf-8")
+
+
+async def search_transcripts(request: web.Request) -> web.Response:
+    index = get_transcript_index()
+    if index is None:
+        raise web.HTTPNotFound(text="Transcript index is disabled")
+    query = request.query.get("q", "")
+    try:
+        limit = min(int(request.query.get("limit", "50")), 500)
+        offset = max(int(request.query.get("offset", "0")), 0)
+    except ValueError:
+        raise web.HTTPBadRequest(text="limit and offset must be integers")
+    order = "recent" if request.query.get("order") == "recent" else "rank"
+    # SQLite is blocking; keep it off the event loop and out of the pipeline pool
+    hits = await asyncio.get_running_loop().run_in_executor(None, index.search, query, limit, offset, order)
+    return web.json_response({"query": query, "limit": limit, "offset": offset, "hits": hits})
+
+
+def evict_expired_jobs(jobs: Dict[str, Job], ttl_seconds: float = API_JOB_TTL_SECONDS) -> int:
+    """Forget jobs that finished more than ``ttl_seconds`` ago and delete their directories.
+
+    Directories in JOBS_DIR that belong to no known job (left over from an
+    earlier process) are removed once they are older than the TTL as well.
+    """
+    cutoff = time.time() - ttl_seconds
+    expired = [job_id for job_id, job in jobs.items()
+               if job.done and job.finished_at is not None and job.finished_at < cutoff]
+    for job_id in expired:
+        shutil.rmtree(jobs.pop(job_id).directory, ignore_errors=True)
+
+    if JOBS_DIR.is_dir():
+        for job_dir in JOBS_DIR.iterdir():
+            try:
+                if job_dir.name not in jobs and job_dir.stat().st_mtime < cutoff:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    expired.append(job_dir.name)
+            except OSError:
+                pass
+    return len(expired)
+
+
+async def _evict_jobs_periodically(app: web.Application) -> None:
+    interval = max(min(API_JOB_TTL_SECONDS / 4, 600.0), 1.0)
+    while True:
+        await asyncio.sleep(interval)
+        # Directory removal is blocking disk I/O
+        await asyncio.get_running_loop().run_in_executor(None, evict_expired_jobs, app[JOBS_KEY])
+
+
+async def _start_eviction(app: web.Application) -> None:
+    app[EVICTION_TASK_KEY] = asyncio.create_task(_evict_jobs_periodically(app))
+
+
+async def _shutdown_executor(app: web.Application) -> None:
+    app[EVICTION_TASK_KEY].cancel()
+    app[EXECUTOR_KEY].shutdown(wait=False, cancel_futures=True)
+
+
+def create_app(workers: int = API_WORKERS, backend_factory: Optional[Callable] = None) -> web.Application:
+    """Build the aiohttp application with its worker pool."""
+    app = web.Application()
+    app[JOBS_KEY] = {}
+    app[BACKEND_FACTORY_KEY] = backend_factory
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+    app.on_startup.append(_start_eviction)
+    app.on_cleanup.append(_shutdown_executor)
+
+    app.router.add_post("/jobs", create_job)
+    app.router.add_get("/jobs/{job_id}", get_job)
+    app.router.add_get("/jobs/{job_id}/events", job_events)
+    app.router.add_get("/jobs/{job_id}/result.srt", get_srt)
+    app.router.add_get("/jobs/{job_id}/result.json", get_json)
+    app.router.add_get("/search", search_transcripts)
+    return app
+
+
+def main():
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    web.run_app(create_app(), host=API_HOST, port=API_PORT)
+
+
+if __name__ == "__main__":
+    main()
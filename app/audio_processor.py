@@ -1,18 +1,21 @@
-import ffmpeg
-import numpy as np
+import logging
+import wave
 from pathlib import Path
 from typing import Optional, Tuple
-import streamlit as st
-import tempfile
 
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from config.settings import TEMP_DIR, SUPPORTED_VIDEO_FORMATS
 
+logger = logging.getLogger(__name__)
 
-def extract_audio(input_path: Path, progress_callback=None) -> Optional[Path]:
+
+def extract_audio(input_path: Path, progress_callback=None, error_callback=None) -> Optional[Path]:
     """Extract audio from video/audio file and convert to WAV format."""
+    import ffmpeg
+    
+    report_error = error_callback or logger.error
     try:
         # Check if input is video or audio
         extension = input_path.suffix.lower().lstrip(".")
@@ -48,26 +51,39 @@ def extract_audio(input_path: Path, progress_callback=None) -> Optional[Path]:
         
     except ffmpeg.Error as e:
         error_message = e.stderr.decode() if e.stderr else str(e)
-        st.error(f"FFmpeg error: {error_message}")
+        report_error(f"FFmpeg error: {error_message}")
         return None
     except Exception as e:
-        st.error(f"Error extracting audio: {str(e)}")
+        report_error(f"Error extracting audio: {str(e)}")
         return None
 
 
-def get_audio_duration(audio_path: Path) -> float:
+def get_audio_duration(audio_path: Path, warning_callback=None) -> float:
     """Get duration of audio file in seconds."""
+    import ffmpeg
+    
     try:
         probe = ffmpeg.probe(str(audio_path))
         duration = float(probe['streams'][0]['duration'])
         return duration
     except Exception as e:
-        st.warning(f"Could not determine audio duration: {e}")
+        (warning_callback or logger.warning)(f"Could not determine audio duration: {e}")
         return 0.0
 
 
+def get_wav_duration(audio_path: Path) -> float:
+    """Get duration of an extracted WAV file from its header (no ffmpeg call)."""
+    try:
+        with wave.open(str(audio_path), "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (OSError, wave.Error, EOFError):
+        return get_audio_duration(audio_path)
+
+
 def validate_audio_file(audio_path: Path) -> Tuple[bool, str]:
     """Validate audio file for processing."""
+    import ffmpeg
+    
     if not audio_path.exists():
         return False, "Audio file does not exist"
     
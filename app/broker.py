@@ -0,0 +1,377 @@
+"""Job brokers for distributed workers.
+
+Workers are stateless: they claim a job from a broker, send heartbeats while
+running it and report the result. A job whose heartbeat goes stale (its
+worker died or lost the network) is put back in the queue, up to
+WORKER_MAX_ATTEMPTS times.
+
+Two backends ship with the app:
+
+- SQLiteBroker: a single database file, for one host or a shared volume
+  with working file locks.
+- RedisBroker: any Redis-compatible client (redis-py, or a local stand-in
+  such as fakeredis), for multiple nodes.
+
+``open_broker(url)`` picks one from ``sqlite:///path/to/broker.db`` or
+``redis://host:6379/0``.
+"""
+import json
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import WORKER_MAX_ATTEMPTS
+
+
+class Broker(ABC):
+    """Queue of pipeline jobs shared by workers.
+
+    A job is a dict with id, payload, status (queued, running, completed,
+    failed), worker, attempts, heartbeat, result and error.
+    """
+
+    def __init__(self, max_attempts: int = WORKER_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def submit(self, payload: Dict) -> str:
+        """Queue a job and return its id."""
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Take the oldest queued job for this worker, or None if the queue is empty."""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Refresh a running job's heartbeat; False if the worker no longer owns it."""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str, result: Dict) -> bool:
+        """Mark a job done; ignored (False) if the worker no longer owns it."""
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Report a failed attempt; the job is re-queued until it runs out of attempts."""
+
+    @abstractmethod
+    def requeue_stale(self, stale_seconds: float) -> List[str]:
+        """Re-queue running jobs whose heartbeat is older than ``stale_seconds``."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job, or None if unknown."""
+
+
+class SQLiteBroker(Broker):
+    """Broker backed by a single SQLite database file."""
+
+    def __init__(self, path: Path, max_attempts: int = WORKER_MAX_ATTEMPTS):
+        super().__init__(max_attempts)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    heartbeat REAL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the broker safe to share between threads
+        db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _run(self, *statements):
+        """Run statements in one write transaction; returns the last cursor."""
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            cursor = None
+            for sql, params in statements:
+                cursor = db.execute(sql, params)
+            db.execute("COMMIT")
+            return cursor
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, payload: Dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._run((
+            "INSERT INTO jobs (id, payload, status, created, updated) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, json.dumps(payload), now, now)
+        ))
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            now = time.time()
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "heartbeat = ?, updated = ? WHERE id = ?",
+                (worker_id, now, now, row["id"])
+            )
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            db.execute("COMMIT")
+            return self._to_dict(job)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        now = time.time()
+        cursor = self._run((
+            "UPDATE jobs SET heartbeat = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (now, now, job_id, worker_id)
+        ))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict) -> bool:
+        cursor = self._run((
+            "UPDATE jobs SET status = 'completed', result = ?, error = NULL, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (json.dumps(result), time.time(), job_id, worker_id)
+        ))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        cursor = self._run((
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "worker = NULL, heartbeat = NULL, error = ?, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (self.max_attempts, error, time.time(), job_id, worker_id)
+        ))
+        return cursor.rowcount == 1
+
+    def requeue_stale(self, stale_seconds: float) -> List[str]:
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            cutoff = time.time() - stale_seconds
+            stale = [row["id"] for row in db.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND heartbeat < ?", (cutoff,)
+            )]
+            db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "worker = NULL, heartbeat = NULL, error = 'Worker heartbeat lost', updated = ? "
+                "WHERE status = 'running' AND heartbeat < ?",
+                (self.max_attempts, time.time(), cutoff)
+            )
+            db.execute("COMMIT")
+            return stale
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        db = self._connect()
+        try:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            db.close()
+        return self._to_dict(row) if row else None
+
+
+class RedisBroker(Broker):
+    """Broker on a Redis-compatible server.
+
+    Queued job ids live in a list and claimed ones in a processing list,
+    which is what stale detection scans. Job fields are kept in one hash per
+    job. Every state change (claim, heartbeat, complete, fail, re-queue)
+    checks and updates the lists and the hash in one MULTI/EXEC transaction
+    under WATCH, so a worker dying halfway or two workers racing can't leave
+    a job half-claimed or owned twice.
+    """
+
+    def __init__(self, client, prefix: str = "natan", max_attempts: int = WORKER_MAX_ATTEMPTS):
+        super().__init__(max_attempts)
+        self.client = client
+        self.queue_key = f"{prefix}:queue"
+        self.processing_key = f"{prefix}:processing"
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisBroker":
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    @staticmethod
+    def _str(value) -> Optional[str]:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def _fields(self, job_id: str, client=None) -> Dict[str, str]:
+        raw = (client or self.client).hgetall(self._job_key(job_id))
+        return {self._str(k): self._str(v) for k, v in raw.items()}
+
+    def _transaction(self, func, *keys):
+        """Run ``func(pipe)`` with ``keys`` watched, retrying if another client changes them.
+
+        ``func`` reads through the pipe, then calls ``pipe.multi()`` and queues
+        its writes; its return value is returned.
+        """
+        return self.client.transaction(func, *keys, value_from_callable=True)
+
+    def _owned_update(self, job_id: str, worker_id: str, update) -> bool:
+        """Apply ``update(pipe, fields)`` atomically if the worker still runs the job."""
+        def run(pipe) -> bool:
+            fields = self._fields(job_id, pipe)
+            if fields.get("status") != "running" or fields.get("worker") != worker_id:
+                return False
+            pipe.multi()
+            update(pipe, fields)
+            return True
+        return self._transaction(run, self._job_key(job_id))
+
+    def _release(self, pipe, job_id: str, fields: Dict[str, str], error: str) -> None:
+        """Queue the writes that move a job out of processing: back to the queue, or failed."""
+        key = self._job_key(job_id)
+        status = "failed" if int(fields.get("attempts", 0)) >= self.max_attempts else "queued"
+        pipe.lrem(self.processing_key, 0, job_id)
+        pipe.hset(key, mapping={"status": status, "worker": "", "error": error, "updated": time.time()})
+        # A re-queued job must not carry its old heartbeat into the next claim
+        pipe.hdel(key, "heartbeat")
+        if status == "queued":
+            pipe.rpush(self.queue_key, job_id)
+
+    def submit(self, payload: Dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._job_key(job_id), mapping={
+            "payload": json.dumps(payload),
+            "status": "queued",
+            "attempts": 0,
+            "created": now,
+            "updated": now,
+        })
+        pipe.lpush(self.queue_key, job_id)
+        pipe.execute()
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        def run(pipe) -> Optional[str]:
+            # Oldest job is at the tail; the watch guarantees it is still there at EXEC
+            job_id = self._str(pipe.lindex(self.queue_key, -1))
+            if job_id is None:
+                return None
+            now = time.time()
+            key = self._job_key(job_id)
+            pipe.multi()
+            pipe.rpop(self.queue_key)
+            pipe.lpush(self.processing_key, job_id)
+            pipe.hincrby(key, "attempts", 1)
+            pipe.hset(key, mapping={"status": "running", "worker": worker_id, "heartbeat": now, "updated": now})
+            return job_id
+
+        job_id = self._transaction(run, self.queue_key)
+        return self.get(job_id) if job_id else None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        def update(pipe, fields):
+            now = time.time()
+            pipe.hset(self._job_key(job_id), mapping={"heartbeat": now, "updated": now})
+        return self._owned_update(job_id, worker_id, update)
+
+    def complete(self, job_id: str, worker_id: str, result: Dict) -> bool:
+        def update(pipe, fields):
+            pipe.hset(self._job_key(job_id), mapping={
+                "status": "completed", "result": json.dumps(result), "error": "", "updated": time.time()
+            })
+            pipe.lrem(self.processing_key, 0, job_id)
+        return self._owned_update(job_id, worker_id, update)
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        def update(pipe, fields):
+            self._release(pipe, job_id, fields, error)
+        return self._owned_update(job_id, worker_id, update)
+
+    def requeue_stale(self, stale_seconds: float) -> List[str]:
+        cutoff = time.time() - stale_seconds
+        stale = []
+        for raw_id in self.client.lrange(self.processing_key, 0, -1):
+            job_id = self._str(raw_id)
+
+            def run(pipe) -> bool:
+                fields = self._fields(job_id, pipe)
+                if fields.get("status") != "running":
+                    return False
+                # No heartbeat at all: claimed by an older version that died mid-claim
+                last_seen = fields.get("heartbeat") or fields.get("updated")
+                if last_seen is None or float(last_seen) >= cutoff:
+                    return False
+                pipe.multi()
+                self._release(pipe, job_id, fields, "Worker heartbeat lost")
+                return True
+
+            # Re-checked under WATCH: a heartbeat or claim in between aborts the release
+            if self._transaction(run, self._job_key(job_id)):
+                stale.append(job_id)
+        return stale
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        fields = self._fields(job_id)
+        if not fields:
+            return None
+        return {
+            "id": job_id,
+            "payload": json.loads(fields["payload"]),
+            "status": fields.get("status"),
+            "worker": fields.get("worker") or None,
+            "attempts": int(fields.get("attempts", 0)),
+            "heartbeat": float(fields["heartbeat"]) if fields.get("heartbeat") else None,
+            "created": float(fields["created"]),
+            "updated": float(fields["updated"]),
+            "result": json.loads(fields["result"]) if fields.get("result") else None,
+            "error": fields.get("error") or None,
+        }
+
+
+def open_broker(url: str) -> Broker:
+    """Create a broker from ``sqlite:///path/to/broker.db`` or ``redis://...``."""
+    if url.startswith("sqlite://"):
+        return SQLiteBroker(Path(url[len("sqlite://"):]))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker.from_url(url)
+    raise ValueError(f"Unsupported broker URL: {url}")
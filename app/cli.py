@@ -0,0 +1,82 @@
+"""Command-line transcription: ``python app/cli.py lecture.mp4 -o lecture.srt``."""
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from pipeline import PipelineError, run_pipeline
+from profiling import profiler_for_job
+from transcript_index import index_transcript
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import LOG_LEVEL, WHISPER_MODEL
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Transcribe an audio/video file to SRT subtitles.")
+    parser.add_argument("input", type=Path, help="Audio or video file to transcribe")
+    parser.add_argument("-o", "--output", type=Path, help="SRT output path (default: next to the input)")
+    parser.add_argument("--json", type=Path, dest="json_output", help="Also write segments and text as JSON")
+    parser.add_argument("--model", default=WHISPER_MODEL, help="Whisper model, or 'auto' together with --deadline")
+    parser.add_argument("--mode", default="sentence", choices=["sentence", "word", "word_precise", "word_lazy"],
+                        help="Timestamp mode")
+    parser.add_argument("--deadline", type=float, help="Target turnaround in seconds for --model auto")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse transcripts of audio chunks unchanged since an earlier version of the file")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile each pipeline stage; artifacts go to <output>.profile/")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=LOG_LEVEL, format="%(levelname)s %(message)s")
+
+    if not args.input.exists():
+        print(f"File not found: {args.input}", file=sys.stderr)
+        return 1
+
+    def progress(status, percent, message):
+        if message:
+            print(f"[{percent if percent is not None else '..':>3}] {message}", file=sys.stderr)
+
+    srt_path = args.output or args.input.with_suffix(".srt")
+    profiler = profiler_for_job(args.profile, srt_path.with_suffix(".profile"))
+
+    try:
+        output = run_pipeline(
+            args.input,
+            model_name=args.model,
+            mode=args.mode,
+            progress_callback=progress,
+            deadline_seconds=args.deadline,
+            keep_input=True,
+            incremental=args.incremental,
+            profiler=profiler
+        )
+    except PipelineError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    srt_path.write_text(output["srt"], encoding="utf-8")
+    print(f"SRT written to {srt_path}", file=sys.stderr)
+    index_transcript(f"file:{srt_path.resolve()}", args.input.name, output["cues"],
+                     duration=output["duration"], model=output["model"], mode=output["mode"],
+                     language=output["language"], mtime=srt_path.stat().st_mtime)
+    if output["profile_dir"]:
+        print(f"Profile written to {output['profile_dir']}", file=sys.stderr)
+
+    if args.json_output:
+        args.json_output.write_text(json.dumps({
+            "model": output["model"],
+            "text": output["text"],
+            "language": output["language"],
+            "segments": output["segments"],
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
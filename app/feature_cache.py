@@ -0,0 +1,223 @@
+"""On-disk cache of log-mel spectrograms shared across models and reruns.
+
+Features are keyed by a hash of the extracted audio and the number of mel
+bins (80 for most checkpoints, 128 for large-v3/turbo), and stored as
+memory-mapped float16 ``.npy`` files. Slicing a cached spectrogram only reads
+the frames it covers, so decoding a 30-second window touches ~3000 frames
+instead of loading the whole file.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import FEATURE_CACHE_DIR, FEATURE_CACHE_ENABLED, FEATURE_CACHE_MAX_GB
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class MelView:
+    """Read-only array-like view of a cached spectrogram (frames x mel bins).
+
+    Indexing returns an ``mx.array`` with just the selected frames, which is
+    what mlx_whisper's decoding loop does with its in-memory spectrogram.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.frames.shape
+
+    @property
+    def ndim(self) -> int:
+        return self.frames.ndim
+
+    @property
+    def dtype(self):
+        return self.frames.dtype
+
+    def window(self, start: int, n_frames: int):
+        """Return frames [start, start + n_frames) as a numpy array."""
+        return self.frames[start:start + n_frames]
+
+    def __getitem__(self, index):
+        import mlx.core as mx
+        import numpy as np
+        return mx.array(np.ascontiguousarray(self.frames[index]))
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+
+class FeatureCache:
+    """Memory-mapped log-mel spectrograms keyed by audio content and mel bins."""
+
+    def __init__(self, root: Path = FEATURE_CACHE_DIR, max_bytes: int = int(FEATURE_CACHE_MAX_GB * 1024 ** 3)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def content_key(self, audio_path: Path) -> str:
+        """Hash of the audio file contents, memoised per (path, size, mtime)."""
+        stat = os.stat(audio_path)
+        memo_key = (str(audio_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._hashes:
+                return self._hashes[memo_key]
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(audio_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        key = digest.hexdigest()
+
+        with self._lock:
+            self._hashes[memo_key] = key
+        return key
+
+    def path_for(self, key: str, n_mels: int, padding: int) -> Path:
+        return self.root / f"{key}_{n_mels}_{padding}.npy"
+
+    def get(self, audio_path: Path, n_mels: int, padding: int = 0) -> Optional[MelView]:
+        """Return the cached spectrogram, or None if it has not been computed yet."""
+        import numpy as np
+
+        path = self.path_for(self.content_key(audio_path), n_mels, padding)
+        try:
+            frames = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # Mark as recently used for eviction
+        return MelView(frames)
+
+    def get_or_compute(self, audio_path: Path, n_mels: int, padding: int = 0, compute=None) -> MelView:
+        """Return the cached spectrogram, computing and storing it on a miss.
+
+        ``compute(audio_path, n_mels, padding)`` defaults to mlx_whisper's
+        ``log_mel_spectrogram``.
+        """
+        import numpy as np
+
+        cached = self.get(audio_path, n_mels, padding)
+        if cached is not None:
+            return cached
+
+        if compute is None:
+            compute = _original_log_mel_spectrogram()
+        mel = np.asarray(compute(str(audio_path), n_mels=n_mels, padding=padding))
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(self.content_key(audio_path), n_mels, padding)
+        tmp_path = path.with_name(f"{path.stem}.{uuid.uuid4().hex}.tmp.npy")
+        frames = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=mel.shape)
+        frames[:] = mel
+        frames.flush()
+        del frames
+        os.replace(tmp_path, path)
+
+        self.evict()
+        return MelView(np.load(path, mmap_mode="r"))
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits its size limit."""
+        try:
+            entries = [(p, p.stat()) for p in self.root.glob("*.npy") if not p.name.endswith(".tmp.npy")]
+        except OSError:
+            return
+        total = sum(stat.st_size for _, stat in entries)
+        for path, stat in sorted(entries, key=lambda entry: entry[1].st_mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= stat.st_size
+            except OSError:
+                pass
+
+
+_cache: Optional[FeatureCache] = None
+_active = threading.local()
+_hook_lock = threading.Lock()
+_original = None
+
+
+def get_feature_cache() -> Optional[FeatureCache]:
+    """Process-wide feature cache, or None when disabled in settings or bypassed in this thread."""
+    global _cache
+    if not FEATURE_CACHE_ENABLED or getattr(_active, "bypass", False):
+        return None
+    with _hook_lock:
+        if _cache is None:
+            _cache = FeatureCache()
+        return _cache
+
+
+def _original_log_mel_spectrogram():
+    if _original is not None:
+        return _original
+    from mlx_whisper.audio import log_mel_spectrogram
+    return log_mel_spectrogram
+
+
+def _cached_log_mel_spectrogram(audio, n_mels: int = 80, padding: int = 0, **kwargs):
+    """Stand-in for mlx_whisper's log_mel_spectrogram that serves the active file from cache."""
+    active = getattr(_active, "entry", None)
+    if active is not None and not kwargs and isinstance(audio, str) and audio == str(active[1]):
+        cache, audio_path = active
+        return cache.get_or_compute(audio_path, n_mels, padding, compute=_original)
+    return _original(audio, n_mels=n_mels, padding=padding, **kwargs)
+
+
+def _install_hook() -> None:
+    """Route mlx_whisper.transcribe's feature extraction through the cache (once per process)."""
+    global _original
+    with _hook_lock:
+        if _original is not None:
+            return
+        transcribe_module = sys.modules.get("mlx_whisper.transcribe")
+        if transcribe_module is None:
+            import importlib
+            transcribe_module = importlib.import_module("mlx_whisper.transcribe")
+        _original = transcribe_module.log_mel_spectrogram
+        transcribe_module.log_mel_spectrogram = _cached_log_mel_spectrogram
+
+
+@contextmanager
+def bypass_feature_cache() -> Iterator[None]:
+    """While active, the current thread doesn't use the cache, e.g. for temporary audio
+    whose features would never be read again and would only push out useful entries."""
+    previous = getattr(_active, "bypass", False)
+    _active.bypass = True
+    try:
+        yield
+    finally:
+        _active.bypass = previous
+
+
+@contextmanager
+def cached_features(audio_path: Path) -> Iterator[Optional[FeatureCache]]:
+    """While active, mlx_whisper.transcribe reads this file's features from the cache.
+
+    Only affects the current thread; yields None (and does nothing) when the
+    cache is disabled.
+    """
+    cache = get_feature_cache()
+    if cache is None:
+        yield None
+        return
+
+    _install_hook()
+    previous = getattr(_active, "entry", None)
+    _active.entry = (cache, Path(audio_path))
+    try:
+        yield cache
+    finally:
+        _active.entry = previous
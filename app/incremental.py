@@ -0,0 +1,284 @@
+"""Incremental re-transcription of edited media.
+
+The extracted PCM is split into content-defined chunks: a rolling hash over
+the samples picks cut points, so trimming or inserting a few seconds only
+changes the chunks around the edit, while every other chunk keeps its
+boundaries and hash. Cut points are snapped to the quietest 10 ms within
+half a second, so chunks rarely split a word.
+
+Transcripts are stored per chunk hash (and model and timestamp mode). When a
+new version of a file comes in, only chunks with unseen hashes are
+transcribed; cached segments of the others are shifted to their new position
+and stitched into one result.
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+import uuid
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import (
+    CDC_AVG_SECONDS, CDC_MAX_SECONDS, CDC_MIN_SECONDS, INCREMENTAL_STORE_DIR, INCREMENTAL_STORE_MAX_MB, TEMP_DIR
+)
+from feature_cache import bypass_feature_cache
+
+HASH_WINDOW = 64  # Samples covered by the rolling hash
+HOP_LENGTH = 160  # Samples per mel frame, to keep segment "seek" offsets consistent
+SNAP_SECONDS = 0.5
+SNAP_FRAME = 160  # 10 ms at 16 kHz
+BLOCK_SAMPLES = 2 * 1024 * 1024  # Samples hashed per numpy pass
+GEAR_SEED = 0x6E6174616E  # Fixed so boundaries are stable across runs and hosts
+
+_gear = None
+
+
+def _gear_table():
+    """Random 32-bit value per 16-bit sample value."""
+    global _gear
+    if _gear is None:
+        import numpy as np
+        _gear = np.random.default_rng(GEAR_SEED).integers(0, 2 ** 32, size=65536, dtype=np.uint64)
+    return _gear
+
+
+def open_pcm(wav_path: Path):
+    """Memory-map the samples of a 16-bit mono WAV file. Returns (samples, sample_rate)."""
+    import numpy as np
+
+    sample_rate = None
+    with open(wav_path, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError("Not a WAV file")
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError("WAV file has no data chunk")
+            chunk_id, size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(size + size % 2)
+                _, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if channels != 1 or bits != 16:
+                    raise ValueError("Expected 16-bit mono PCM")
+            elif chunk_id == b"data":
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + size % 2, 1)
+
+    if sample_rate is None:
+        raise ValueError("WAV file has no format chunk")
+    # The data size can be a placeholder when ffmpeg could not seek back to fix it
+    n_samples = min(size, os.path.getsize(wav_path) - offset) // 2
+    return np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(n_samples,)), sample_rate
+
+
+def _snap_to_silence(samples, position: int, low: int, high: int, sample_rate: int) -> int:
+    """Move a cut to the quietest 10 ms frame within SNAP_SECONDS, staying inside (low, high)."""
+    import numpy as np
+
+    radius = int(SNAP_SECONDS * sample_rate)
+    start = max(low + 1, position - radius)
+    n_frames = (min(high - 1, position + radius) - start) // SNAP_FRAME
+    if n_frames <= 0:
+        return position
+    frames = np.abs(samples[start:start + n_frames * SNAP_FRAME].astype(np.int32)).reshape(n_frames, SNAP_FRAME)
+    return start + int(np.argmin(frames.sum(axis=1))) * SNAP_FRAME + SNAP_FRAME // 2
+
+
+def find_chunk_boundaries(samples, sample_rate: int) -> List[int]:
+    """Content-defined cut points (exclusive chunk ends, the last one is len(samples))."""
+    import numpy as np
+
+    gear = _gear_table()
+    mask = np.uint64((1 << round(math.log2(CDC_AVG_SECONDS * sample_rate))) - 1)
+    min_len = int(CDC_MIN_SECONDS * sample_rate)
+    max_len = int(CDC_MAX_SECONDS * sample_rate)
+    n = len(samples)
+
+    # Positions right after every HASH_WINDOW-sample window whose hash hits the mask
+    candidates: List[int] = []
+    for block_start in range(0, n, BLOCK_SAMPLES):
+        low = max(0, block_start - HASH_WINDOW + 1)
+        block = np.asarray(samples[low:block_start + BLOCK_SAMPLES])
+        if len(block) < HASH_WINDOW:
+            continue
+        sums = np.cumsum(gear[block.astype(np.int32) + 32768], dtype=np.uint64)
+        window_sums = sums[HASH_WINDOW - 1:].copy()
+        window_sums[1:] -= sums[:-HASH_WINDOW]
+        candidates.extend((np.flatnonzero((window_sums & mask) == 0) + low + HASH_WINDOW).tolist())
+
+    cuts: List[int] = []
+    last = 0
+    for candidate in candidates:
+        while candidate - last > max_len:
+            last += max_len
+            cuts.append(last)
+        if candidate - last < min_len or n - candidate < min_len:
+            continue
+        cut = _snap_to_silence(samples, candidate, last + min_len, n, sample_rate)
+        if cut - last >= min_len:
+            cuts.append(cut)
+            last = cut
+    while n - last > max_len:
+        last += max_len
+        cuts.append(last)
+    cuts.append(n)
+    return cuts
+
+
+def split_into_chunks(samples, sample_rate: int) -> List[Tuple[int, int, str]]:
+    """Return (start_sample, end_sample, content_hash) for each chunk."""
+    chunks = []
+    start = 0
+    for end in find_chunk_boundaries(samples, sample_rate):
+        if end <= start:
+            continue
+        digest = hashlib.blake2b(samples[start:end].tobytes(), digest_size=16, person=str(sample_rate).encode())
+        chunks.append((start, end, digest.hexdigest()))
+        start = end
+    return chunks
+
+
+class ChunkTranscriptStore:
+    """Transcripts of individual chunks on disk, keyed by chunk hash, model and mode.
+
+    Capped at ``max_bytes``; reading an entry marks it as recently used.
+    """
+
+    def __init__(self, root: Path = INCREMENTAL_STORE_DIR, max_bytes: int = int(INCREMENTAL_STORE_MAX_MB * 1024 ** 2)):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, model_name: str, mode: str, chunk_hash: str) -> Path:
+        return self.root / model_name.replace("/", "__") / mode / f"{chunk_hash}.json"
+
+    def get(self, model_name: str, mode: str, chunk_hash: str) -> Optional[Dict]:
+        path = self._path(model_name, mode, chunk_hash)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # Mark as recently used for eviction
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, model_name: str, mode: str, chunk_hash: str, entry: Dict) -> None:
+        path = self._path(model_name, mode, chunk_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the store fits its size limit."""
+        try:
+            entries = [(p, p.stat()) for p in self.root.glob("*/*/*.json")]
+        except OSError:
+            return
+        total = sum(stat.st_size for _, stat in entries)
+        for path, stat in sorted(entries, key=lambda entry: entry[1].st_mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= stat.st_size
+            except OSError:
+                pass
+
+
+def shift_segment(segment: Dict, seconds: float, frames: int) -> Dict:
+    """Copy of a segment moved by ``seconds`` (and ``frames`` mel frames), words included."""
+    shifted = dict(segment)
+    shifted["start"] = segment.get("start", 0) + seconds
+    shifted["end"] = segment.get("end", 0) + seconds
+    if "seek" in segment:
+        shifted["seek"] = segment["seek"] + frames
+    if "words" in segment:
+        shifted["words"] = [
+            {**word, "start": word.get("start", 0) + seconds, "end": word.get("end", 0) + seconds}
+            for word in segment["words"]
+        ]
+    return shifted
+
+
+def _write_chunk_wav(samples, sample_rate: int, start: int, end: int) -> Path:
+    path = TEMP_DIR / f"chunk_{uuid.uuid4().hex}.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples[start:end].tobytes())
+    return path
+
+
+def transcribe_incremental(
+    transcriber,
+    audio_path: Path,
+    mode: str = "sentence",
+    progress_callback=None,
+    error_callback=None,
+    store: Optional[ChunkTranscriptStore] = None
+) -> Optional[Dict]:
+    """Transcribe only chunks not seen before and stitch them with cached ones.
+
+    Returns a result shaped like mlx_whisper's (text, segments, language) plus
+    an ``incremental`` summary, or None if a chunk fails to transcribe.
+    """
+    store = store or ChunkTranscriptStore()
+    samples, sample_rate = open_pcm(audio_path)
+    chunks = split_into_chunks(samples, sample_rate)
+
+    segments: List[Dict] = []
+    language = None
+    reused, reused_seconds = 0, 0.0
+    stored = False
+    for index, (start, end, chunk_hash) in enumerate(chunks, 1):
+        entry = store.get(transcriber.model_name, mode, chunk_hash)
+        if entry is not None:
+            reused += 1
+            reused_seconds += (end - start) / sample_rate
+        else:
+            if progress_callback:
+                progress_callback(f"מתמלל קטע {index} מתוך {len(chunks)}")
+            chunk_path = _write_chunk_wav(samples, sample_rate, start, end)
+            try:
+                # The chunk file is deleted right after, so its features are never worth caching
+                with bypass_feature_cache():
+                    result = transcriber.transcribe_with_updates(chunk_path, mode=mode, error_callback=error_callback)
+            finally:
+                chunk_path.unlink(missing_ok=True)
+            if not result:
+                return None
+            entry = {"language": result.get("language"), "segments": result.get("segments", [])}
+            store.put(transcriber.model_name, mode, chunk_hash, entry)
+            stored = True
+
+        language = language or entry.get("language")
+        offset = start / sample_rate
+        segments.extend(shift_segment(segment, offset, start // HOP_LENGTH) for segment in entry["segments"])
+
+    if stored:
+        store.evict()
+    if progress_callback and reused:
+        progress_callback(f"נעשה שימוש חוזר ב-{reused} מתוך {len(chunks)} קטעים ({reused_seconds / 60:.1f} דקות)")
+
+    for index, segment in enumerate(segments):
+        segment["id"] = index
+    return {
+        "text": "".join(segment.get("text", "") for segment in segments),
+        "segments": segments,
+        "language": language,
+        "incremental": {
+            "chunks": len(chunks),
+            "reused_chunks": reused,
+            "reused_seconds": round(reused_seconds, 2),
+        },
+    }
@@ -0,0 +1,292 @@
+"""Online detection of Whisper repetition / hallucination loops.
+
+Audio is decoded window by window through a backend. Every segment is fed to
+a LoopDetector as it arrives; when the recent text turns repetitive (high
+compression ratio, repeated word n-grams, identical consecutive segments) or
+looks hallucinated over silence (high no-speech probability), the window is
+abandoned and decoded again with settings that break loops. Only bad windows
+are redone.
+
+mlx_whisper decodes a whole window before returning its segments, so with the
+real backend a loop is only caught once its window is done; the report gives
+the time spent on retries, not time saved. Backends that yield segments while
+decoding (ScriptedBackend) are stopped at the first looping segment.
+
+Backends implement ``decode(audio_path, start, end, options)`` and yield
+segment dicts (absolute ``start``/``end`` seconds, ``text`` and optionally
+``no_speech_prob``/``avg_logprob``). ScriptedBackend replays canned segments,
+so the guard can be exercised without a model.
+"""
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import (
+    LOOP_COMPRESSION_RATIO, LOOP_GUARD_WINDOW_SECONDS, LOOP_NGRAM_REPETITION,
+    LOOP_NO_SPEECH_PROB, LOOP_REPEATED_SEGMENTS
+)
+from feature_cache import cached_features, get_feature_cache
+from incremental import shift_segment
+
+# Decoding settings for a window that looped: no conditioning on the looping
+# text, temperature fallback and a stricter compression check
+RETRY_OPTIONS = {
+    "condition_on_previous_text": False,
+    "temperature": (0.2, 0.4, 0.6, 0.8, 1.0),
+    "compression_ratio_threshold": 2.2,
+}
+PROMPT_CHARS = 200  # Tail of the previous window's text used as the next window's prompt
+BOUNDARY_SECONDS = 0.5  # A segment ending this close to a window end may be cut off
+
+
+def compression_ratio(text: str) -> float:
+    """zlib compression ratio of the text; repetitive text compresses well."""
+    data = text.encode("utf-8")
+    if not data:
+        return 0.0
+    return len(data) / len(zlib.compress(data))
+
+
+def ngram_repetition(words: List[str], n: int = 3) -> float:
+    """Share of word n-grams that already occurred earlier in the sequence."""
+    grams = [tuple(words[i:i + n]) for i in range(len(words) - n + 1)]
+    if not grams:
+        return 0.0
+    return 1 - len(set(grams)) / len(grams)
+
+
+class LoopDetector:
+    """Flags segments that continue a repetition loop or hallucinate over silence."""
+
+    def __init__(self, history: int = 8):
+        self.history = history
+        self.reset()
+
+    def reset(self) -> None:
+        self._recent = deque(maxlen=self.history)
+        self._last_text = ""
+        self._repeats = 0
+
+    def state(self) -> Tuple:
+        return (list(self._recent), self._last_text, self._repeats)
+
+    def restore(self, state: Tuple) -> None:
+        recent, self._last_text, self._repeats = state
+        self._recent = deque(recent, maxlen=self.history)
+
+    def observe(self, segment: Dict) -> Optional[str]:
+        """Add a segment; return the reason if it looks like part of a loop."""
+        text = " ".join(segment.get("text", "").lower().split())
+
+        if text and text == self._last_text:
+            self._repeats += 1
+        else:
+            self._repeats = 1
+        self._last_text = text
+        if self._repeats >= LOOP_REPEATED_SEGMENTS:
+            return "repeated segment"
+
+        if segment.get("no_speech_prob", 0.0) > LOOP_NO_SPEECH_PROB and segment.get("avg_logprob", 0.0) < -1.0:
+            return "no speech"
+
+        self._recent.append(text)
+        recent_text = " ".join(self._recent)
+        if len(recent_text) >= 60 and compression_ratio(recent_text) > LOOP_COMPRESSION_RATIO:
+            return "compression ratio"
+        words = recent_text.split()
+        if len(words) >= 12 and ngram_repetition(words) > LOOP_NGRAM_REPETITION:
+            return "n-gram repetition"
+        return None
+
+
+class MlxWhisperBackend:
+    """Decodes one clip at a time with mlx_whisper.
+
+    mlx_whisper.transcribe builds the spectrogram of whatever it is given, so
+    each window must not cost a pass over the whole file. With the feature
+    cache, the file's spectrogram is memory-mapped and a window reads only its
+    frames. Without it, the audio is decoded once per file and every window
+    gets just its own slice of samples.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.language: Optional[str] = None
+        self._audio = None  # (path, samples) of the file being transcribed
+
+    def _samples(self, audio_path: Path):
+        if self._audio is None or self._audio[0] != audio_path:
+            from mlx_whisper.audio import load_audio
+            self._audio = (audio_path, load_audio(str(audio_path)))
+        return self._audio[1]
+
+    def decode(self, audio_path: Path, start: float, end: float, options: Dict) -> Iterator[Dict]:
+        import mlx_whisper
+        from mlx_whisper.audio import FRAMES_PER_SECOND, HOP_LENGTH, SAMPLE_RATE
+
+        if get_feature_cache() is not None:
+            with cached_features(audio_path):
+                result = mlx_whisper.transcribe(
+                    str(audio_path),
+                    path_or_hf_repo=self.model_name,
+                    clip_timestamps=[start, end],
+                    verbose=False,
+                    **options
+                )
+            segments = result.get("segments", [])
+        else:
+            # Cut on frame boundaries so seek offsets stay whole spectrogram frames
+            first_frame = round(start * FRAMES_PER_SECOND)
+            last_frame = round(end * FRAMES_PER_SECOND)
+            samples = self._samples(audio_path)[first_frame * HOP_LENGTH:last_frame * HOP_LENGTH]
+            result = mlx_whisper.transcribe(
+                samples,
+                path_or_hf_repo=self.model_name,
+                verbose=False,
+                **options
+            )
+            offset = first_frame * HOP_LENGTH / SAMPLE_RATE
+            segments = [shift_segment(segment, offset, first_frame) for segment in result.get("segments", [])]
+        self.language = result.get("language")
+        yield from segments
+
+
+class ScriptedBackend:
+    """Fake backend for tests and benchmarks.
+
+    ``script(start, end, options)`` returns the segments for a window. They are
+    yielded lazily, sleeping ``realtime_factor`` seconds per second of audio,
+    like a backend that streams segments while decoding.
+    """
+
+    def __init__(self, script: Callable[[float, float, Dict], List[Dict]],
+                 realtime_factor: float = 0.0, language: str = "he"):
+        self.script = script
+        self.realtime_factor = realtime_factor
+        self.language = language
+        self.calls: List[Tuple[float, float, Dict]] = []
+
+    def decode(self, audio_path: Path, start: float, end: float, options: Dict) -> Iterator[Dict]:
+        self.calls.append((start, end, dict(options)))
+        position = start
+        for segment in self.script(start, end, options):
+            if self.realtime_factor:
+                time.sleep(max(0.0, segment["end"] - position) * self.realtime_factor)
+            position = segment["end"]
+            yield segment
+
+
+class LoopGuard:
+    """Windowed transcription that aborts and redoes windows caught in a loop."""
+
+    def __init__(self, backend, window_seconds: float = LOOP_GUARD_WINDOW_SECONDS):
+        self.backend = backend
+        self.window_seconds = window_seconds
+
+    def _decode_window(self, detector: LoopDetector, audio_path: Path, start: float, end: float,
+                       options: Dict, abort_on_loop: bool) -> Tuple[List[Dict], Optional[Tuple[str, float]], int]:
+        """Decode a window through the detector.
+
+        Returns (segments, (reason, time) if aborted, number of dropped segments).
+        Without ``abort_on_loop`` flagged segments are dropped instead.
+        """
+        kept, dropped = [], 0
+        segments = self.backend.decode(audio_path, start, end, options)
+        try:
+            for segment in segments:
+                reason = detector.observe(segment)
+                if reason and abort_on_loop:
+                    return kept, (reason, segment.get("start", start)), dropped
+                if reason:
+                    dropped += 1
+                    continue
+                kept.append(segment)
+        finally:
+            close = getattr(segments, "close", None)
+            if close:
+                close()
+        return kept, None, dropped
+
+    def transcribe(self, audio_path: Path, duration: float, options: Optional[Dict] = None,
+                   progress_callback=None) -> Dict:
+        """Transcribe the whole file; the result matches mlx_whisper's shape plus a ``loop_guard`` report."""
+        options = dict(options or {})
+        detector = LoopDetector()
+        report = {
+            "windows": 0,
+            "aborted_windows": 0,
+            "dropped_segments": 0,
+            "aborted_seconds": 0.0,  # Decoding spent on attempts that were thrown away
+            "retry_seconds": 0.0,  # Decoding spent on redoing those windows
+            "aborts": [],
+        }
+        segments: List[Dict] = []
+        language = options.get("language")
+
+        start = 0.0
+        while start < duration - 0.05:
+            end = min(duration, start + self.window_seconds)
+            window_options = dict(options)
+            if language:
+                window_options["language"] = language
+            if segments and options.get("condition_on_previous_text", True):
+                window_options["initial_prompt"] = "".join(s["text"] for s in segments[-10:])[-PROMPT_CHARS:]
+
+            state = detector.state()
+            started_at = time.perf_counter()
+            window_segments, abort, _ = self._decode_window(
+                detector, audio_path, start, end, window_options, abort_on_loop=True
+            )
+            report["windows"] += 1
+
+            if abort:
+                reason, abort_at = abort
+                report["aborted_windows"] += 1
+                report["aborted_seconds"] += time.perf_counter() - started_at
+                report["aborts"].append({"start": start, "end": end, "at": abort_at, "reason": reason})
+
+                detector.restore(state)
+                retry_options = {**options, **RETRY_OPTIONS}
+                if language:
+                    retry_options["language"] = language
+                started_at = time.perf_counter()
+                window_segments, _, dropped = self._decode_window(
+                    detector, audio_path, start, end, retry_options, abort_on_loop=False
+                )
+                report["retry_seconds"] += time.perf_counter() - started_at
+                report["dropped_segments"] += dropped
+
+            language = language or getattr(self.backend, "language", None)
+
+            next_start = end
+            if (end < duration and len(window_segments) > 1
+                    and window_segments[-1]["end"] >= end - BOUNDARY_SECONDS
+                    and window_segments[-1]["start"] > start + 1.0):
+                # The last segment may be cut at the window edge; decode it with the next window
+                next_start = window_segments.pop()["start"]
+            # Resync the detector with what was kept, so dropped junk and the
+            # segment handed to the next window don't count as repeats
+            detector.restore(state)
+            for segment in window_segments:
+                detector.observe(segment)
+            segments.extend(window_segments)
+            start = next_start
+
+            if progress_callback:
+                progress_callback(f"תומללו {min(start, duration) / 60:.1f} מתוך {duration / 60:.1f} דקות")
+
+        for index, segment in enumerate(segments):
+            segment["id"] = index
+        report["aborted_seconds"] = round(report["aborted_seconds"], 2)
+        report["retry_seconds"] = round(report["retry_seconds"], 2)
+        return {
+            "text": "".join(segment.get("text", "") for segment in segments),
+            "segments": segments,
+            "language": language,
+            "loop_guard": report,
+        }
@@ -1,16 +1,14 @@
 import streamlit as st
-from pathlib import Path
 import time
-import os
 
-from audio_processor import extract_audio, validate_audio_file
-from realtime_transcriber import RealtimeTranscriber
-from srt_generator import SRTGenerator
+from profiling import default_profile_dir, profiler_for_job
+from result_store import get_result_store
+from transcript_index import index_transcript
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from utils.file_handler import save_uploaded_file, cleanup_file, get_file_info
-from config.settings import SUPPORTED_FORMATS, STREAMLIT_MAX_UPLOAD_SIZE, WHISPER_MODEL
+from utils.file_handler import save_uploaded_file
+from config.settings import SUPPORTED_FORMATS, PREVIEW_CUES_PER_PAGE
 
 # Page configuration
 st.set_page_config(
@@ -19,11 +17,17 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize session state
-if "transcription_result" not in st.session_state:
-    st.session_state.transcription_result = None
-if "srt_content" not in st.session_state:
-    st.session_state.srt_content = None
+# Status line shown for each pipeline stage (see pipeline.run_pipeline)
+STAGE_LABELS = {
+    "extracting": "חילוץ אודיו...",
+    "transcribing": "מתחיל תמלול (זה עלול לקחת זמן)...",
+    "generating": "יוצר קובץ SRT...",
+}
+
+# Initialize session state. Results live in the shared result store; the
+# session only keeps a handle to them.
+if "result_handle" not in st.session_state:
+    st.session_state.result_handle = None
 if "processing" not in st.session_state:
     st.session_state.processing = False
 if "transcribed_words" not in st.session_state:
@@ -32,6 +36,46 @@ if "current_segment" not in st.session_state:
     st.session_state.current_segment = ""
 
 
+def align_on_demand(store, handle, result_meta):
+    """Let the user pick whole-segment cues to split into words, then rebuild the result."""
+    saved = store.alignment(handle)
+    if saved is None:
+        st.warning("נתוני היישור אינם זמינים עוד")
+        return
+    audio_path, alignment = saved
+    unaligned = [i for i, segment in enumerate(alignment["segments"]) if "words" not in segment]
+    if not unaligned:
+        st.info("כל הכתוביות כבר מפוצלות למילים")
+        return
+    
+    def label(i):
+        segment = alignment["segments"][i]
+        minutes, seconds = divmod(int(segment["start"]), 60)
+        return f"{minutes:02d}:{seconds:02d} {segment['text'].strip()[:60]}"
+    
+    chosen = st.multiselect("כתוביות לפיצול", unaligned, format_func=label, key=f"align_{handle}")
+    if st.button("חשב חותמות זמן למילים", disabled=not chosen, key=f"align_run_{handle}"):
+        from pipeline import PipelineError, align_segments
+        try:
+            with st.spinner("מחשב חותמות זמן למילים..."):
+                output = align_segments(audio_path, alignment, chosen, model_name=result_meta["model"])
+        except PipelineError as e:
+            st.error(str(e))
+            return
+        store.update(handle, output["srt"], output["segments"], alignment)
+        index_transcript(
+            f"web:{handle}",
+            result_meta["filename"],
+            output["cues"],
+            st.warning,
+            duration=result_meta.get("duration"),
+            model=result_meta["model"],
+            mode=result_meta["mode"],
+            language=alignment.get("language")
+        )
+        st.rerun()
+
+
 def main():
     # Header
     st.title("🎬 נתן תמלול")
@@ -48,7 +92,8 @@ def main():
             "mlx-community/whisper-tiny": "Tiny (39M) - הכי מהיר",
             "mlx-community/whisper-small": "Small (244M) - מאוזן",
             "mlx-community/whisper-medium": "Medium (769M) - דיוק טוב יותר",
-            "mlx-community/whisper-large-v3": "Large-v3 (1.5B) - דיוק מקסימלי"
+            "mlx-community/whisper-large-v3": "Large-v3 (1.5B) - דיוק מקסימלי",
+            "auto": "אוטומטי - המודל המדויק ביותר שעומד בזמן היעד"
         }
         
         selected_model = st.selectbox(
@@ -58,12 +103,26 @@ def main():
             index=0  # Default to turbo
         )
         
+        target_minutes = None
+        if selected_model == "auto":
+            target_minutes = st.number_input(
+                "זמן יעד לסיום (דקות)",
+                min_value=1,
+                value=10,
+                help="המערכת תבחר את המודל המדויק ביותר שצפוי לסיים בזמן, לפי מהירות שנמדדה במחשב זה ועומס נוכחי"
+            )
+        
         # Timestamp mode
         timestamp_mode = st.radio(
             "מצב חותמות זמן",
-            options=["sentence", "word", "word_precise"],
-            format_func=lambda x: {"sentence": "ברמת משפט", "word": "ברמת מילה (קבוצות)", "word_precise": "ברמת מילה (מדויק)"}[x],
-            help="ברמת משפט: כתוביות קריאות | ברמת מילה (קבוצות): מילים בקבוצות קטנות | ברמת מילה (מדויק): מילה אחת בכל כתובית"
+            options=["sentence", "word", "word_precise", "word_lazy"],
+            format_func=lambda x: {"sentence": "ברמת משפט", "word": "ברמת מילה (קבוצות)", "word_precise": "ברמת מילה (מדויק)", "word_lazy": "ברמת מילה (מהיר)"}[x],
+            help="ברמת משפט: כתוביות קריאות | ברמת מילה (קבוצות): מילים בקבוצות קטנות | ברמת מילה (מדויק): מילה אחת בכל כתובית | ברמת מילה (מהיר): יישור מילים רק למשפטים ארוכים"
+        )
+        
+        incremental = st.checkbox(
+            "תמלול מצטבר",
+            help="בגרסה חדשה של קובץ שכבר תומלל (למשל אחרי קיצור), רק הקטעים שהשתנו יתומללו מחדש"
         )
         
         st.divider()
@@ -100,6 +159,11 @@ def main():
                 st.session_state.processing = True
                 st.session_state.transcribed_words = []
                 st.session_state.current_segment = ""
+                # ?profile=1 in the page URL (or PROFILE_JOBS) profiles this run
+                profiler = profiler_for_job(
+                    st.query_params.get("profile", "").lower() in ("1", "true", "yes"),
+                    default_profile_dir(time.strftime("%Y%m%d-%H%M%S"))
+                )
                 
                 # Progress container
                 progress_container = st.container()
@@ -110,57 +174,21 @@ def main():
                     try:
                         # Step 1: Save uploaded file
                         status_text.text("שמירת הקובץ...")
-                        progress_bar.progress(10)
-                        input_path = save_uploaded_file(uploaded_file)
+                        input_path = save_uploaded_file(uploaded_file, error_callback=st.error)
                         
                         if not input_path:
                             st.error("שגיאה בשמירת הקובץ")
+                            profiler.finish()
                             st.session_state.processing = False
                             return
                         
-                        # Step 2: Extract audio
-                        status_text.text("חילוץ אודיו...")
-                        progress_bar.progress(20)
-                        audio_path = extract_audio(input_path, lambda msg: status_text.text(msg))
-                        
-                        if not audio_path:
-                            st.error("שגיאה בחילוץ האודיו")
-                            cleanup_file(input_path)
-                            st.session_state.processing = False
-                            return
-                        
-                        # Step 3: Validate audio
-                        status_text.text("בדיקת תקינות האודיו...")
-                        progress_bar.progress(30)
-                        is_valid, message = validate_audio_file(audio_path)
-                        
-                        if not is_valid:
-                            st.error(f"בדיקת האודיו נכשלה: {message}")
-                            cleanup_file(input_path)
-                            cleanup_file(audio_path)
-                            st.session_state.processing = False
-                            return
-                        
-                        st.info(message)
-                        
-                        # Step 4: Initialize transcriber
-                        status_text.text("טעינת מודל Whisper...")
-                        progress_bar.progress(40)
-                        transcriber = RealtimeTranscriber(selected_model)
-                        transcriber.load_model(lambda msg: status_text.text(msg))
-                        
-                        # Step 5: Transcribe with real-time updates
-                        status_text.text("מתחיל תמלול (זה עלול לקחת זמן)...")
-                        progress_bar.progress(60)
-                        
                         # Create placeholders for real-time updates
-                        if col2:
-                            with col2:
-                                realtime_placeholder = st.empty()
-                                with realtime_placeholder.container():
-                                    st.subheader("🎤 תמלול בזמן אמת")
-                                    current_segment_placeholder = st.empty()
-                                    words_placeholder = st.empty()
+                        with col2:
+                            realtime_placeholder = st.empty()
+                            with realtime_placeholder.container():
+                                st.subheader("🎤 תמלול בזמן אמת")
+                                current_segment_placeholder = st.empty()
+                                words_placeholder = st.empty()
                         
                         def realtime_update(word, segment_info):
                             """Update real-time display"""
@@ -172,43 +200,61 @@ def main():
                             words_text = " ".join(st.session_state.transcribed_words[-30:])  # Show last 30 words
                             words_placeholder.text_area("מילים שתומללו:", words_text, height=150, disabled=True, key=f"words_{len(st.session_state.transcribed_words)}")
                         
-                        result = transcriber.transcribe_with_updates(
-                            audio_path, 
-                            mode=timestamp_mode,
-                            progress_callback=lambda msg: status_text.text(msg),
-                            realtime_callback=realtime_update
-                        )
-                        
-                        if not result:
-                            st.error("התמלול נכשל")
-                            cleanup_file(input_path)
-                            cleanup_file(audio_path)
-                            st.session_state.processing = False
-                            return
-                        
-                        # Step 6: Generate SRT
-                        status_text.text("יוצר קובץ SRT...")
-                        progress_bar.progress(80)
+                        def show_progress(status, percent, message):
+                            if percent is not None:
+                                progress_bar.progress(percent)
+                            status_text.text(STAGE_LABELS.get(status) or message)
                         
-                        segments = transcriber.extract_segments(result, mode=timestamp_mode)
-                        srt_gen = SRTGenerator()
-                        srt_content = srt_gen.generate_srt(segments, mode=timestamp_mode)
-                        
-                        # Step 7: Validate SRT
-                        if not srt_gen.validate_srt(srt_content):
-                            st.error("אימות קובץ ה-SRT נכשל")
-                            cleanup_file(input_path)
-                            cleanup_file(audio_path)
-                            st.session_state.processing = False
+                        # Steps 2-6: extract, transcribe and build the SRT in the shared pipeline,
+                        # imported on first use so the page itself loads quickly
+                        from pipeline import PipelineError, run_pipeline
+                        try:
+                            output = run_pipeline(
+                                input_path,
+                                model_name=selected_model,
+                                mode=timestamp_mode,
+                                progress_callback=show_progress,
+                                deadline_seconds=target_minutes * 60 if target_minutes else None,
+                                incremental=incremental,
+                                profiler=profiler,
+                                realtime_callback=realtime_update,
+                                # word_lazy results can have more words aligned later
+                                keep_audio=timestamp_mode == "word_lazy"
+                            )
+                        except PipelineError as e:
+                            st.error(f"התמלול נכשל: {e}")
                             return
                         
-                        # Store results in session state
-                        st.session_state.transcription_result = result
-                        st.session_state.srt_content = srt_content
+                        if selected_model == "auto":
+                            st.info(f"נבחר מודל: {model_options[output['model']]}")
                         
-                        # Cleanup
-                        cleanup_file(input_path)
-                        cleanup_file(audio_path)
+                        # Store results on disk and keep only the handle in the session
+                        store = get_result_store()
+                        if st.session_state.result_handle:
+                            store.delete(st.session_state.result_handle)
+                        st.session_state.result_handle = store.save(
+                            output["srt"],
+                            output["text"],
+                            output["segments"],
+                            uploaded_file.name,
+                            audio_path=output.get("audio_path"),
+                            alignment=output.get("alignment"),
+                            model=output["model"],
+                            mode=timestamp_mode,
+                            duration=output["duration"],
+                            language=output["language"]
+                        )
+                        # Keep it searchable after the result expires (see the search page)
+                        index_transcript(
+                            f"web:{st.session_state.result_handle}",
+                            uploaded_file.name,
+                            output["cues"],
+                            st.warning,
+                            duration=output["duration"],
+                            model=output["model"],
+                            mode=timestamp_mode,
+                            language=output["language"]
+                        )
                         
                         # Complete
                         progress_bar.progress(100)
@@ -217,6 +263,8 @@ def main():
                         
                         st.success("התמלול הושלם בהצלחה!")
                         st.balloons()
+                        if output["profile_dir"]:
+                            st.info(f"פרופיל הריצה נשמר ב: {output['profile_dir']}")
                         
                     except Exception as e:
                         st.error(f"אירעה שגיאה: {str(e)}")
@@ -240,37 +288,52 @@ def main():
                     words_text = " ".join(st.session_state.transcribed_words[-50:])  # Show last 50 words
                     st.text_area("", words_text, height=200, disabled=True)
         
-        if st.session_state.srt_content:
-            # Display transcription
-            if st.session_state.transcription_result:
-                full_text = st.session_state.transcription_result.get("text", "")
-                if full_text:
-                    with st.expander("צפה בתמלול המלא"):
-                        st.text_area("טקסט מתומלל", full_text, height=200)
+        store = get_result_store()
+        result_meta = store.meta(st.session_state.result_handle) if st.session_state.result_handle else None
+        if st.session_state.result_handle and result_meta is None:
+            # Result expired from the store
+            st.session_state.result_handle = None
+        
+        if result_meta:
+            handle = st.session_state.result_handle
             
-            # Display SRT preview
+            # Display transcription (loaded only when asked for)
+            if st.toggle("צפה בתמלול המלא"):
+                st.text_area("טקסט מתומלל", store.text(handle), height=200)
+            
+            # Display SRT preview, one page of cues at a time
             st.subheader("תצוגה מקדימה של SRT")
-            srt_preview = st.text_area(
-                "תוכן SRT", 
-                st.session_state.srt_content, 
-                height=400,
-                help="זהו תוכן קובץ ה-SRT שנוצר"
+            cue_count = result_meta["cue_count"]
+            page_count = max(1, -(-cue_count // PREVIEW_CUES_PER_PAGE))
+            page = st.number_input(
+                f"עמוד (מתוך {page_count})",
+                min_value=1,
+                max_value=page_count,
+                value=1,
+                key=f"preview_page_{handle}"
             )
-            
-            # Download button
-            st.download_button(
-                label="⬇️ הורד קובץ SRT",
-                data=st.session_state.srt_content,
-                file_name=f"{uploaded_file.name.rsplit('.', 1)[0]}.srt" if uploaded_file else "subtitles.srt",
-                mime="text/plain",
-                type="primary"
+            st.code(
+                store.cues(handle, (page - 1) * PREVIEW_CUES_PER_PAGE, PREVIEW_CUES_PER_PAGE),
+                language=None
             )
             
+            # Split more segments into words on demand (word_lazy results only)
+            if result_meta.get("alignable") and st.toggle("פיצול כתוביות למילים"):
+                align_on_demand(store, handle, result_meta)
+            
+            # Download button; the SRT is read only when asked for, not on every rerun
+            if st.button("הכן קובץ SRT", key=f"prepare_{handle}"):
+                st.download_button(
+                    label="⬇️ הורד קובץ SRT",
+                    data=store.srt_bytes(handle),
+                    file_name=f"{result_meta['filename'].rsplit('.', 1)[0]}.srt",
+                    mime="text/plain",
+                    type="primary",
+                    key=f"download_{handle}"
+                )
+            
             # Statistics
-            if st.session_state.srt_content:
-                lines = st.session_state.srt_content.strip().split('\n')
-                subtitle_count = len([l for l in lines if l.strip().isdigit()])
-                st.metric("סך הכל כתוביות", subtitle_count)
+            st.metric("סך הכל כתוביות", cue_count)
         else:
             st.info("העלה קובץ ולחץ על 'התחל תמלול' כדי ליצור כתוביות")
 
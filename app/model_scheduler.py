@@ -0,0 +1,213 @@
+import fcntl
+import json
+import platform
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import DEFAULT_REALTIME_FACTORS, MODEL_STATS_PATH, WHISPER_MODELS_BY_ACCURACY
+
+# Weight of the newest measurement in the moving average
+RTF_SMOOTHING = 0.3
+# A measurement counts as at most this many times faster or slower than the current estimate
+RTF_MAX_STEP = 3.0
+
+
+class ModelScheduler:
+    """Pick the most accurate model that meets a turnaround target.
+
+    Keeps a moving average of measured real-time factors per host and model,
+    and counts the jobs currently running in this process so estimates grow
+    (and the choice downgrades) when the machine is busy.
+
+    The stats file is shared by every process on the host (web UI, API,
+    workers): measurements are merged into it under a file lock, and it is
+    re-read whenever another process has changed it.
+    """
+
+    def __init__(self, stats_path: Path = MODEL_STATS_PATH, host: Optional[str] = None):
+        self.stats_path = stats_path
+        self.host = host or platform.node() or "localhost"
+        self.active_jobs = 0
+        self._lock = threading.Lock()
+        self._stats: Dict = {}
+        self._stats_version = None  # (mtime, size) of the file _stats was read from
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.stats_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_stats(self) -> Dict:
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _current_stats(self) -> Dict:
+        """The stats file as last saved by any process; re-read only when it changed."""
+        with self._lock:
+            version = self._file_version()
+            if version != self._stats_version:
+                self._stats = self._load_stats()
+                self._stats_version = version
+            return self._stats
+
+    @contextmanager
+    def _locked_file(self) -> Iterator[None]:
+        """Exclusive lock on the stats file across processes, held while merging a measurement."""
+        self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.stats_path.with_name(self.stats_path.name + ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_stats(self, stats: Dict) -> None:
+        tmp_path = self.stats_path.with_name(f"{self.stats_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+
+    @staticmethod
+    def _prior(model_name: str) -> float:
+        return DEFAULT_REALTIME_FACTORS.get(model_name, max(DEFAULT_REALTIME_FACTORS.values()))
+
+    def realtime_factor(self, model_name: str) -> float:
+        """Measured real-time factor on this host, or the prior if never measured."""
+        measured = self._current_stats().get(self.host, {}).get(model_name)
+        if measured:
+            return measured["rtf"]
+        return self._prior(model_name)
+
+    def estimate_seconds(self, model_name: str, audio_duration: float, load: Optional[int] = None) -> float:
+        """Estimated processing time, assuming running jobs share the machine evenly."""
+        if load is None:
+            load = self.active_jobs
+        return self.realtime_factor(model_name) * audio_duration * (1 + load)
+
+    def choose_model(self, audio_duration: float, deadline_seconds: float, load: Optional[int] = None) -> str:
+        """Return the most accurate model expected to finish within the deadline.
+
+        Falls back to the fastest model when none fits.
+        """
+        for model_name in reversed(WHISPER_MODELS_BY_ACCURACY):
+            if self.estimate_seconds(model_name, audio_duration, load) <= deadline_seconds:
+                return model_name
+        return min(WHISPER_MODELS_BY_ACCURACY, key=lambda m: self.estimate_seconds(m, audio_duration, load))
+
+    def record(self, model_name: str, audio_duration: float, elapsed_seconds: float, load: int = 0) -> None:
+        """Fold a finished run into the model's real-time factor for this host.
+
+        The first run is blended with the prior, and each run may move the
+        estimate by a bounded step only: a model that looks far too slow once
+        (cold caches, a busy machine) is never chosen again by ``auto``, so it
+        would never be measured back to its real speed.
+        """
+        if audio_duration <= 0 or elapsed_seconds <= 0:
+            return
+        # Normalise to an unloaded machine so estimates can re-apply the current load
+        rtf = elapsed_seconds / audio_duration / (1 + load)
+
+        try:
+            with self._lock, self._locked_file():
+                # Merge into what other processes saved, not into this process's copy
+                stats = self._load_stats()
+                host_stats = stats.setdefault(self.host, {})
+                previous = host_stats.get(model_name)
+                current = previous["rtf"] if previous else self._prior(model_name)
+                rtf = min(max(rtf, current / RTF_MAX_STEP), current * RTF_MAX_STEP)
+                rtf = RTF_SMOOTHING * rtf + (1 - RTF_SMOOTHING) * current
+                samples = previous["samples"] + 1 if previous else 1
+                host_stats[model_name] = {"rtf": rtf, "samples": samples}
+                self._save_stats(stats)
+                self._stats, self._stats_version = stats, self._file_version()
+        except OSError:
+            pass  # Stats are an optimisation; never fail a job over them
+
+    @contextmanager
+    def track_job(self) -> Iterator[int]:
+        """Count a running job; yields the number of other jobs running when it started."""
+        with self._lock:
+            load = self.active_jobs
+            self.active_jobs += 1
+        try:
+            yield load
+        finally:
+            with self._lock:
+                self.active_jobs -= 1
+
+
+class ModelGate:
+    """Lets jobs in one process run concurrently only while they use the same model.
+
+    mlx_whisper keeps a single model per process (ModelHolder), so two
+    threads on different models would reload it back and forth, with the
+    loop guard on nearly every window. Jobs for another model wait until the
+    running ones finish; waiting jobs go in arrival order, so a steady stream
+    of jobs on one model can't starve the others.
+    """
+
+    def __init__(self):
+        self.model_name: Optional[str] = None
+        self.active_jobs = 0
+        self._queue: deque = deque()
+        self._changed = threading.Condition()
+
+    @contextmanager
+    def use(self, model_name: str, on_wait=None) -> Iterator[None]:
+        """Hold the process's model for a job; ``on_wait()`` is called if the job has to wait first."""
+        ticket = object()
+        with self._changed:
+            self._queue.append(ticket)
+            waited = False
+            while not (self._queue[0] is ticket and (self.active_jobs == 0 or self.model_name == model_name)):
+                if not waited and on_wait:
+                    on_wait()
+                waited = True
+                self._changed.wait()
+            self._queue.popleft()
+            self.model_name = model_name
+            self.active_jobs += 1
+            # The next job in line may use the same model
+            self._changed.notify_all()
+        try:
+            yield
+        finally:
+            with self._changed:
+                self.active_jobs -= 1
+                self._changed.notify_all()
+
+
+_scheduler: Optional[ModelScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ModelScheduler:
+    """Process-wide scheduler shared by all sessions and API jobs."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ModelScheduler()
+        return _scheduler
+
+
+_gate: Optional[ModelGate] = None
+
+
+def get_model_gate() -> ModelGate:
+    """Process-wide model gate shared by all sessions and API jobs."""
+    global _gate
+    with _scheduler_lock:
+        if _gate is None:
+            _gate = ModelGate()
+        return _gate
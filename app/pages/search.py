@@ -0,0 +1,81 @@
+import streamlit as st
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))  # config, when this page is opened first
+from srt_generator import SRTGenerator
+from transcript_index import get_transcript_index
+
+RESULTS_PER_PAGE = 50
+
+st.set_page_config(
+    page_title="נתן תמלול - חיפוש בתמלולים",
+    page_icon="🔎",
+    layout="wide"
+)
+
+
+def format_ms(ms: int) -> str:
+    seconds, ms = divmod(ms, 1000)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d},{ms:03d}"
+
+
+def main():
+    st.title("🔎 חיפוש בתמלולים")
+
+    index = get_transcript_index()
+    if index is None:
+        st.warning("אינדקס התמלולים כבוי (TRANSCRIPT_INDEX_ENABLED=false)")
+        return
+
+    stats = index.stats()
+    st.caption(f"{stats['transcripts']} תמלולים, {stats['cues']} כתוביות, {stats['hours']:.1f} שעות")
+    st.markdown('כל המילים חייבות להופיע בכתובית. "מילים במירכאות" - ביטוי מדויק. מילה* - חיפוש לפי תחילית.')
+
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        query = st.text_input("חיפוש", placeholder="מה נאמר?")
+    with col2:
+        order = st.selectbox("מיון", ["rank", "recent"], format_func=lambda o: {"rank": "רלוונטיות", "recent": "חדשים קודם"}[o])
+
+    if not query.strip():
+        return
+
+    page = st.number_input("עמוד", min_value=1, value=1, key=f"search_page_{query}_{order}")
+    hits = index.search(query, RESULTS_PER_PAGE, (page - 1) * RESULTS_PER_PAGE, order)
+    if not hits:
+        st.info("לא נמצאו תוצאות")
+        return
+
+    # Hits grouped by transcript, in result order
+    transcripts = {}
+    for hit in hits:
+        transcripts.setdefault(hit["transcript_id"], []).append(hit)
+
+    srt_gen = SRTGenerator()
+    for transcript_id, transcript_hits in transcripts.items():
+        filename = transcript_hits[0]["filename"]
+        with st.expander(f"📄 {filename} ({len(transcript_hits)})", expanded=True):
+            for hit in transcript_hits:
+                st.markdown(
+                    f"`{format_ms(hit['start_ms'])}` ({hit['start_ms']} ms) &nbsp; #{hit['cue']} &nbsp; {hit['text']}"
+                )
+
+            # Transcripts stay downloadable here after their result expired
+            if st.button("הכן קובץ SRT", key=f"prepare_{transcript_id}"):
+                cues = [
+                    {"index": cue["cue"], "start": cue["start_ms"] / 1000, "end": cue["end_ms"] / 1000, "text": cue["text"]}
+                    for cue in index.cues(transcript_id)
+                ]
+                st.download_button(
+                    label="⬇️ הורד קובץ SRT",
+                    data=srt_gen.format_cues(cues).encode("utf-8"),
+                    file_name=f"{filename.rsplit('.', 1)[0]}.srt",
+                    mime="text/plain",
+                    key=f"download_{transcript_id}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""UI-independent extract -> transcribe -> SRT pipeline.
+
+Used by the Streamlit page, the HTTP API, the workers and the CLI. Nothing heavy is imported here; ffmpeg and
+mlx_whisper are loaded by the stage functions on first use, so worker
+processes and the CLI start quickly.
+"""
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from audio_processor import extract_audio, validate_audio_file, get_audio_duration
+from incremental import transcribe_incremental
+from model_scheduler import get_model_gate, get_scheduler
+from profiling import NULL_PROFILER
+from realtime_transcriber import RealtimeTranscriber
+from srt_generator import SRTGenerator
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.file_handler import cleanup_file
+from config.settings import WHISPER_MODEL
+
+# progress_callback(status, percent, message); status and percent may be None
+ProgressCallback = Callable[[Optional[str], Optional[int], str], None]
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline stage fails; the message says which and why."""
+
+
+def run_pipeline(
+    input_path: Path,
+    model_name: str = WHISPER_MODEL,
+    mode: str = "sentence",
+    progress_callback: Optional[ProgressCallback] = None,
+    deadline_seconds: Optional[float] = None,
+    submitted_at: Optional[float] = None,
+    keep_input: bool = False,
+    incremental: bool = False,
+    profiler=NULL_PROFILER,
+    backend=None,
+    realtime_callback=None,
+    keep_audio: bool = False
+) -> Dict:
+    """Transcribe a media file and build its subtitles.
+
+    ``model_name="auto"`` picks the model with the scheduler, using
+    ``deadline_seconds`` counted from ``submitted_at`` (default: now).
+    ``incremental`` reuses cached transcripts of unchanged audio chunks.
+    ``profiler`` (see profiling.py) wraps each stage and is finished on return.
+    ``backend`` replaces mlx_whisper decoding, e.g. a stub for load tests.
+    ``realtime_callback(word, segment_info)`` receives live transcription updates.
+    ``keep_audio`` leaves the extracted audio in place for ``align_segments``;
+    the output then also has its ``audio_path`` and the ``alignment`` data
+    (language and raw segments), and the caller owns the file.
+    Returns a dict with model, mode, text, language, segments, the subtitle
+    cues and srt.
+    """
+    def emit(status, progress, message):
+        if progress_callback:
+            progress_callback(status, progress, message)
+
+    errors: List[str] = []
+    audio_path = None
+    try:
+        emit("extracting", 10, "Extracting audio...")
+        with profiler.stage("extract_audio"):
+            audio_path = extract_audio(input_path, lambda msg: emit(None, None, msg), errors.append)
+        if not audio_path:
+            raise PipelineError(f"Audio extraction failed: {'; '.join(errors)}")
+
+        is_valid, message = validate_audio_file(audio_path)
+        if not is_valid:
+            raise PipelineError(f"Audio validation failed: {message}")
+        emit("transcribing", 30, message)
+
+        scheduler = get_scheduler()
+        audio_duration = get_audio_duration(audio_path)
+        if model_name == "auto":
+            if deadline_seconds is None:
+                raise PipelineError("Automatic model selection requires a deadline")
+            # Decide at dispatch time so time spent queued and current load count
+            remaining = deadline_seconds - (time.time() - (submitted_at or time.time()))
+            model_name = scheduler.choose_model(audio_duration, remaining)
+            emit(None, None, f"Selected model: {model_name}")
+
+        transcriber = RealtimeTranscriber(model_name, backend=backend)
+        # One model in memory per process: wait for jobs on another model to finish
+        gate = get_model_gate().use(
+            model_name, lambda: emit(None, None, "Waiting for jobs on another model to finish...")
+        ) if backend is None else nullcontext()
+        with gate:
+            try:
+                # Before the clock starts: a download or load is not transcription speed
+                transcriber.load_model(lambda msg: emit(None, None, msg))
+            except Exception as e:
+                raise PipelineError(f"Model loading failed: {e}") from e
+            started_at = time.time()
+            with scheduler.track_job() as load, profiler.stage("transcribe_with_updates"):
+                if incremental:
+                    result = transcribe_incremental(
+                        transcriber,
+                        audio_path,
+                        mode=mode,
+                        progress_callback=lambda msg: emit(None, None, msg),
+                        error_callback=errors.append
+                    )
+                else:
+                    result = transcriber.transcribe_with_updates(
+                        audio_path,
+                        mode=mode,
+                        progress_callback=lambda msg: emit(None, None, msg),
+                        realtime_callback=realtime_callback,
+                        error_callback=errors.append
+                    )
+            elapsed = time.time() - started_at
+        if not result:
+            raise PipelineError(f"Transcription failed: {'; '.join(errors)}")
+        # Only audio that was actually transcribed counts towards the model's speed,
+        # and a substitute backend says nothing about the model's speed
+        if backend is None:
+            transcribed = audio_duration - (result.get("incremental") or {}).get("reused_seconds", 0.0)
+            scheduler.record(model_name, transcribed, elapsed, load)
+
+        emit("generating", 80, "Generating SRT...")
+        with profiler.stage("extract_segments"):
+            segments = transcriber.extract_segments(result, mode=mode)
+        srt_gen = SRTGenerator()
+        with profiler.stage("generate_srt"):
+            cues = srt_gen.build_cues(segments, mode=mode)
+            srt_content = srt_gen.format_cues(cues)
+        if not srt_gen.validate_srt(srt_content):
+            raise PipelineError("SRT validation failed")
+
+        output = {
+            "model": model_name,
+            "mode": mode,
+            "text": transcriber.get_full_text(result),
+            "language": result.get("language"),
+            "duration": audio_duration,
+            "segments": segments,
+            "srt": srt_content,
+            "cues": cues,
+            "loop_guard": result.get("loop_guard"),
+            "incremental": result.get("incremental"),
+            "profile_dir": str(profiler.output_dir) if profiler.enabled else None,
+        }
+        if keep_audio:
+            output["audio_path"] = audio_path
+            output["alignment"] = {"language": result.get("language"), "segments": result["segments"]}
+            audio_path = None  # Handed over to the caller
+        return output
+    finally:
+        profiler.finish()
+        if not keep_input:
+            cleanup_file(input_path)
+        if audio_path:
+            cleanup_file(audio_path)
+
+
+def align_segments(
+    audio_path: Path,
+    alignment: Dict,
+    segment_indices: List[int],
+    model_name: str = WHISPER_MODEL,
+    mode: str = "word_lazy"
+) -> Dict:
+    """Split chosen segments of a finished result into words and rebuild its subtitles.
+
+    ``alignment`` is the data ``run_pipeline(keep_audio=True)`` returned; its
+    segments gain word timestamps in place, so it can be saved and aligned
+    again later. Returns a dict with the new segments, cues and srt.
+    """
+    transcriber = RealtimeTranscriber(model_name)
+    result = {"language": alignment.get("language"), "segments": alignment["segments"]}
+    try:
+        with get_model_gate().use(model_name):
+            transcriber.align_words(audio_path, result, segment_indices)
+    except Exception as e:
+        raise PipelineError(f"Word alignment failed: {e}") from e
+
+    segments = transcriber.extract_segments(result, mode=mode)
+    srt_gen = SRTGenerator()
+    cues = srt_gen.build_cues(segments, mode=mode)
+    srt_content = srt_gen.format_cues(cues)
+    if not srt_gen.validate_srt(srt_content):
+        raise PipelineError("SRT validation failed")
+    return {"segments": segments, "srt": srt_content, "cues": cues}
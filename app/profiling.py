@@ -0,0 +1,212 @@
+"""Opt-in per-job profiling of the pipeline stages.
+
+Turn it on with PROFILE_JOBS=true, ``?profile=1`` (Streamlit page or HTTP
+API) or ``--profile`` (CLI, worker submit). Each stage wrapped in
+``profiler.stage(name)`` then leaves in the job's profile directory:
+
+- ``<stage>.prof``: cProfile stats (``python -m pstats`` or snakeviz)
+- ``<stage>.tracemalloc`` and ``<stage>.alloc.txt``: allocation snapshot and its top lines
+- ``stacks.collapsed``: sampled stacks of all stages in collapsed format,
+  ready for flamegraph.pl or speedscope
+- ``summary.json``: wall time and peak traced memory growth per stage
+
+When profiling is off, ``NULL_PROFILER.stage()`` returns a shared no-op
+context manager, so the pipeline pays nothing. Profiling errors are logged
+and never fail the job.
+
+tracemalloc is process-wide: concurrently profiled jobs share it, and it is
+stopped when the last traced stage ends. A stage that overlapped another
+traced stage is marked ``shared`` in the summary, since its peak includes the
+other job's allocations.
+"""
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterator
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import PROFILE_DIR, PROFILE_JOBS, PROFILE_SAMPLE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+ALLOCATION_TOP_LINES = 30
+
+_tracing_lock = threading.Lock()
+_tracing_stages = 0  # Traced stages in progress, across all jobs
+_tracing_count = 0  # Traced stages started so far
+_tracing_started = False  # Whether tracing was started here (and may be stopped here)
+
+
+def _start_tracing() -> int:
+    """Register a traced stage; return its number, or -1 if other stages are being traced."""
+    global _tracing_stages, _tracing_count, _tracing_started
+    with _tracing_lock:
+        _tracing_count += 1
+        _tracing_stages += 1
+        if _tracing_stages > 1:
+            # Resetting the peak would corrupt the other stages' measurement
+            return -1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            _tracing_started = True
+        tracemalloc.reset_peak()
+        return _tracing_count
+
+
+def _stop_tracing() -> None:
+    """Unregister a traced stage; tracing stops with the last one."""
+    global _tracing_stages, _tracing_started
+    with _tracing_lock:
+        _tracing_stages -= 1
+        if _tracing_stages == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def _trace_snapshot() -> tracemalloc.Snapshot:
+    """Snapshot taken while this stage still holds tracing, so it can't be stopped underneath."""
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+
+class _NullProfiler:
+    """Profiler stand-in used when profiling is off."""
+
+    enabled = False
+    output_dir = None
+    _context = nullcontext()
+
+    def stage(self, name: str):
+        return self._context
+
+    def finish(self) -> None:
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, prefix: str, counts: Counter, interval: float):
+        super().__init__(name=f"profile-sampler-{prefix}", daemon=True)
+        self.thread_id = thread_id
+        self.prefix = prefix
+        self.counts = counts
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join([self.prefix] + stack[::-1])] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class JobProfiler:
+    """Collects cProfile, sampled stacks and allocation snapshots per pipeline stage."""
+
+    enabled = True
+
+    def __init__(self, output_dir: Path, sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.sample_interval = sample_interval
+        self.stacks: Counter = Counter()
+        self.summary: Dict[str, Dict] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        traced = sampler = profile = None
+        try:
+            traced = _start_tracing()
+            baseline, _ = tracemalloc.get_traced_memory()
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active (e.g. a concurrent profiled job on 3.12+)
+                profile = None
+
+            sampler = _StackSampler(threading.get_ident(), name, self.stacks, self.sample_interval)
+            sampler.start()
+        except Exception as e:
+            logger.warning("Could not start profiling stage %s: %s", name, e)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            try:
+                if sampler is not None:
+                    sampler.stop()
+                if profile is not None:
+                    profile.disable()
+                    profile.dump_stats(str(self.output_dir / f"{name}.prof"))
+                if traced is not None:
+                    alone = traced == _tracing_count  # No other stage started since
+                    _, peak = tracemalloc.get_traced_memory()
+                    snapshot = _trace_snapshot()
+                    snapshot.dump(str(self.output_dir / f"{name}.tracemalloc"))
+                    with open(self.output_dir / f"{name}.alloc.txt", "w", encoding="utf-8") as f:
+                        for stat in snapshot.statistics("lineno")[:ALLOCATION_TOP_LINES]:
+                            f.write(f"{stat}\n")
+
+                    self.summary[name] = {
+                        "seconds": round(elapsed, 4),
+                        "peak_traced_mb": round(max(peak - baseline, 0) / (1024 * 1024), 2),
+                        "shared": not alone,
+                        "samples": sum(count for stack, count in self.stacks.items() if stack.startswith(name + ";")),
+                    }
+            except Exception as e:
+                logger.warning("Could not save profile of stage %s: %s", name, e)
+            finally:
+                if traced is not None:
+                    _stop_tracing()
+
+    def finish(self) -> None:
+        """Write the collapsed stacks and summary."""
+        try:
+            with open(self.output_dir / "stacks.collapsed", "w", encoding="utf-8") as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            with open(self.output_dir / "summary.json", "w", encoding="utf-8") as f:
+                json.dump(self.summary, f, indent=2)
+        except OSError as e:
+            logger.warning("Could not save profile summary to %s: %s", self.output_dir, e)
+
+
+def profiler_for_job(enabled: bool, output_dir: Path):
+    """Return a JobProfiler writing to ``output_dir`` when profiling is on, else NULL_PROFILER."""
+    if not (enabled or PROFILE_JOBS):
+        return NULL_PROFILER
+    try:
+        return JobProfiler(output_dir)
+    except OSError as e:
+        logger.warning("Profiling disabled, cannot create %s: %s", output_dir, e)
+        return NULL_PROFILER
+
+
+def default_profile_dir(job_id: str) -> Path:
+    return PROFILE_DIR / job_id
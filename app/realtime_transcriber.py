@@ -1,31 +1,45 @@
-import mlx_whisper
-import streamlit as st
+import logging
 import time
 from pathlib import Path
-from typing import Dict, Literal
+from typing import Dict, Iterable, List, Literal, Optional
 import threading
 
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from config.settings import WHISPER_MODEL
+from config.settings import WHISPER_MODEL, MAX_CHARS_PER_LINE, MAX_SUBTITLE_DURATION, LOOP_GUARD_ENABLED
+from audio_processor import get_wav_duration
+from feature_cache import cached_features, get_feature_cache
+from loop_guard import LoopGuard, MlxWhisperBackend
+
+logger = logging.getLogger(__name__)
 
 
 class RealtimeTranscriber:
-    def __init__(self, model_name: str = WHISPER_MODEL):
+    def __init__(self, model_name: str = WHISPER_MODEL, backend=None):
+        """``backend`` replaces mlx_whisper decoding (see loop_guard.py), e.g. a
+        ScriptedBackend for load tests."""
         self.model_name = model_name
+        self.backend = backend
         self.model = None
         self.is_transcribing = False
         
     def load_model(self, progress_callback=None):
-        """Load the Whisper model."""
+        """Load the Whisper model into mlx_whisper's model cache, downloading it if needed.
+        
+        Done up front so the load isn't timed as transcription (see ModelScheduler).
+        """
         if self.model is not None:
             return
         
         if progress_callback:
             progress_callback(f"טוען מודל: {self.model_name}")
         
-        # Model will be downloaded automatically if not cached
+        if self.backend is None:
+            import mlx.core as mx
+            from mlx_whisper.transcribe import ModelHolder
+            # Same cache and dtype that mlx_whisper.transcribe uses (fp16 by default)
+            ModelHolder.get_model(self.model_name, mx.float16)
         self.model = self.model_name
         
         if progress_callback:
@@ -34,9 +48,10 @@ class RealtimeTranscriber:
     def transcribe_with_updates(
         self,
         audio_path: Path,
-        mode: Literal["word", "sentence", "word_precise"] = "sentence",
+        mode: Literal["word", "sentence", "word_precise", "word_lazy"] = "sentence",
         progress_callback=None,
-        realtime_callback=None
+        realtime_callback=None,
+        error_callback=None
     ) -> Dict:
         """Transcribe audio file with simulated real-time updates."""
         
@@ -71,16 +86,40 @@ class RealtimeTranscriber:
                 progress_thread.daemon = True
                 progress_thread.start()
             
-            # Set options based on mode - enable word timestamps for both word modes
+            # Set options based on mode - enable word timestamps for both word modes.
+            # word_lazy transcribes at segment level and aligns words afterwards.
             word_timestamps = (mode in ["word", "word_precise"])
             
-            # Perform actual transcription
-            result = mlx_whisper.transcribe(
-                str(audio_path),
-                path_or_hf_repo=self.model_name,
-                word_timestamps=word_timestamps,
-                verbose=False
-            )
+            # Perform actual transcription, reusing cached log-mel features when available
+            if LOOP_GUARD_ENABLED or self.backend is not None:
+                # Window by window, redoing windows that fall into repetition loops
+                guard = LoopGuard(self.backend or MlxWhisperBackend(self.model_name))
+                result = guard.transcribe(
+                    audio_path,
+                    get_wav_duration(audio_path),
+                    {"word_timestamps": word_timestamps},
+                    progress_callback
+                )
+                report = result["loop_guard"]
+                if report["aborted_windows"] and progress_callback:
+                    progress_callback(
+                        f"זוהו לולאות חזרה ב-{report['aborted_windows']} חלונות "
+                        f"(פענוח חוזר: {report['aborted_seconds'] + report['retry_seconds']:.0f} שניות)"
+                    )
+            else:
+                import mlx_whisper
+                with cached_features(audio_path):
+                    result = mlx_whisper.transcribe(
+                        str(audio_path),
+                        path_or_hf_repo=self.model_name,
+                        word_timestamps=word_timestamps,
+                        verbose=False
+                    )
+            
+            if mode == "word_lazy":
+                if progress_callback:
+                    progress_callback("מחשב חותמות זמן למילים...")
+                self.align_words(audio_path, result)
             
             self.is_transcribing = False
             
@@ -91,10 +130,93 @@ class RealtimeTranscriber:
             
         except Exception as e:
             self.is_transcribing = False
-            st.error(f"שגיאת תמלול: {str(e)}")
+            (error_callback or logger.error)(f"שגיאת תמלול: {str(e)}")
             return None
     
-    def extract_segments(self, result: Dict, mode: Literal["word", "sentence", "word_precise"] = "sentence") -> list:
+    def needs_word_alignment(self, segment: Dict) -> bool:
+        """Check whether a segment is too long to be shown as a single subtitle."""
+        duration = segment.get("end", 0) - segment.get("start", 0)
+        return duration > MAX_SUBTITLE_DURATION or len(segment.get("text", "").strip()) > MAX_CHARS_PER_LINE
+    
+    def align_words(self, audio_path: Path, result: Dict, segment_indices: Optional[Iterable[int]] = None) -> Dict:
+        """Add word timestamps to selected segments of a segment-level result.
+        
+        By default only segments that need splitting are aligned; pass
+        ``segment_indices`` to align specific segments on demand. Alignment runs
+        once per 30-second decoding window, like mlx_whisper does with
+        word_timestamps=True, but windows without a selected segment are skipped.
+        """
+        import mlx.core as mx
+        from mlx_whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, load_audio, log_mel_spectrogram, pad_or_trim
+        from mlx_whisper.timing import add_word_timestamps
+        from mlx_whisper.tokenizer import get_tokenizer
+        from mlx_whisper.transcribe import ModelHolder
+        
+        segments = (result or {}).get("segments", [])
+        if segment_indices is None:
+            selected = {i for i, segment in enumerate(segments) if self.needs_word_alignment(segment)}
+        else:
+            selected = {i for i in segment_indices if 0 <= i < len(segments)}
+        selected = {i for i in selected if "words" not in segments[i] and segments[i].get("tokens")}
+        if not selected:
+            return result
+        # Alignment redoes whole windows; segments split earlier keep their words as they were
+        aligned_before = {i: segment["words"] for i, segment in enumerate(segments) if "words" in segment}
+        
+        # Group segments by the decoding window (seek offset) they came from
+        windows: Dict[int, List[int]] = {}
+        for i, segment in enumerate(segments):
+            windows.setdefault(segment.get("seek", 0), []).append(i)
+        
+        model = ModelHolder.get_model(self.model_name, mx.float16)
+        tokenizer = get_tokenizer(
+            model.is_multilingual,
+            num_languages=model.num_languages,
+            language=result.get("language"),
+            task="transcribe"
+        )
+        # Features come from the cache (shared with transcription) when enabled,
+        # otherwise each window is computed from its slice of the audio
+        cache = get_feature_cache()
+        if cache is not None:
+            features = cache.get_or_compute(audio_path, model.dims.n_mels, N_SAMPLES)
+            content_frames = features.shape[0] - N_FRAMES
+        else:
+            audio = load_audio(str(audio_path))
+            content_frames = len(audio) // HOP_LENGTH
+        
+        for seek, indices in sorted(windows.items()):
+            if not selected.intersection(indices):
+                continue
+            
+            if cache is not None:
+                mel = features[seek:seek + N_FRAMES]
+            else:
+                window_audio = audio[seek * HOP_LENGTH:seek * HOP_LENGTH + N_SAMPLES]
+                mel = log_mel_spectrogram(window_audio, n_mels=model.dims.n_mels, padding=N_SAMPLES)
+            mel = pad_or_trim(mel, N_FRAMES, axis=-2).astype(mx.float16)
+            
+            window_segments = [segments[i] for i in indices]
+            last_speech_timestamp = segments[indices[0] - 1]["end"] if indices[0] > 0 else 0.0
+            add_word_timestamps(
+                segments=window_segments,
+                model=model,
+                tokenizer=tokenizer,
+                mel=mel,
+                num_frames=max(1, min(N_FRAMES, content_frames - seek)),
+                last_speech_timestamp=last_speech_timestamp
+            )
+            
+            # Keep words only where they were asked for, so short segments stay whole cues
+            for i in indices:
+                if i in aligned_before:
+                    segments[i]["words"] = aligned_before[i]
+                elif i not in selected:
+                    segments[i].pop("words", None)
+        
+        return result
+    
+    def extract_segments(self, result: Dict, mode: Literal["word", "sentence", "word_precise", "word_lazy"] = "sentence") -> list:
         """Extract segments with timestamps from transcription result."""
         segments = []
         
@@ -102,7 +224,7 @@ class RealtimeTranscriber:
             return segments
         
         for segment in result["segments"]:
-            if mode in ["word", "word_precise"] and "words" in segment:
+            if mode in ["word", "word_precise", "word_lazy"] and "words" in segment:
                 # Extract word-level timestamps
                 for word_info in segment["words"]:
                     segments.append({
@@ -0,0 +1,233 @@
+"""Disk-backed store for finished transcription results.
+
+Streamlit sessions keep only a handle; the SRT, full text and segments live
+on disk under RESULT_STORE_DIR (word_lazy results also keep their audio and
+raw segments, so more words can be aligned on demand). A byte-bounded LRU
+cache shared by all sessions keeps recently viewed pieces in memory, and a
+cue offset index lets the preview read one page of cues without loading the
+whole SRT.
+"""
+import json
+import shutil
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import RESULT_CACHE_MB, RESULT_STORE_DIR, RESULT_TTL_HOURS
+
+OFFSET = struct.Struct("<Q")
+
+
+class _LRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[tuple, object]" = OrderedDict()
+        self._sizes: Dict[tuple, int] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key: tuple, value, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._total -= self._sizes.pop(key)
+                del self._items[key]
+            self._items[key] = value
+            self._sizes[key] = size
+            self._total += size
+            while self._total > self.max_bytes:
+                old_key, _ = self._items.popitem(last=False)
+                self._total -= self._sizes.pop(old_key)
+
+    def discard_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._items if k[0] == prefix]:
+                del self._items[key]
+                self._total -= self._sizes.pop(key)
+
+
+class ResultStore:
+    """Finished results on disk, addressed by opaque handles."""
+
+    def __init__(self, root: Path = RESULT_STORE_DIR, cache_bytes: int = RESULT_CACHE_MB * 1024 * 1024,
+                 ttl_hours: float = RESULT_TTL_HOURS):
+        self.root = root
+        self.ttl_seconds = ttl_hours * 3600
+        self._cache = _LRUCache(cache_bytes)
+
+    def _dir(self, handle: str) -> Path:
+        # Handles are generated here; reject anything that could escape the root
+        if not handle or not handle.isalnum():
+            raise ValueError(f"Invalid result handle: {handle!r}")
+        return self.root / handle
+
+    def _write_srt(self, directory: Path, srt_content: str) -> int:
+        """Write the SRT and its cue offset index; return the number of cues."""
+        # Byte offset of every cue, plus the end of the file, for paged reads
+        offsets = []
+        position = 0
+        with open(directory / "subtitles.srt", "wb") as srt_file:
+            for block in srt_content.strip().split("\n\n"):
+                if not block.strip():
+                    continue
+                data = (block.strip("\n") + "\n\n").encode("utf-8")
+                offsets.append(position)
+                srt_file.write(data)
+                position += len(data)
+        offsets.append(position)
+        with open(directory / "cues.idx", "wb") as index_file:
+            index_file.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+        return len(offsets) - 1
+
+    def save(self, srt_content: str, text: str, segments: List[Dict], filename: str,
+             audio_path: Optional[Path] = None, alignment: Optional[Dict] = None, **meta) -> str:
+        """Write a result to disk and return its handle.
+
+        With ``audio_path`` and ``alignment`` (see ``pipeline.run_pipeline(keep_audio=True)``)
+        the audio is moved into the result, so words can be aligned on demand later.
+        """
+        self.prune()
+        handle = uuid.uuid4().hex
+        directory = self._dir(handle)
+        directory.mkdir(parents=True)
+
+        cue_count = self._write_srt(directory, srt_content)
+        (directory / "text.txt").write_text(text, encoding="utf-8")
+        (directory / "segments.json").write_text(json.dumps(segments, ensure_ascii=False), encoding="utf-8")
+        alignable = audio_path is not None and alignment is not None
+        if alignable:
+            shutil.move(str(audio_path), str(directory / "audio.wav"))
+            (directory / "alignment.json").write_text(json.dumps(alignment, ensure_ascii=False), encoding="utf-8")
+        (directory / "meta.json").write_text(json.dumps({
+            "filename": filename,
+            "cue_count": cue_count,
+            "created": time.time(),
+            "alignable": alignable,
+            **meta,
+        }, ensure_ascii=False), encoding="utf-8")
+        return handle
+
+    def alignment(self, handle: str) -> Optional[Tuple[Path, Dict]]:
+        """Audio path and alignment data of a result saved with them, else None."""
+        directory = self._dir(handle)
+        try:
+            with open(directory / "alignment.json", "r", encoding="utf-8") as f:
+                alignment = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return directory / "audio.wav", alignment
+
+    def update(self, handle: str, srt_content: str, segments: List[Dict], alignment: Optional[Dict] = None) -> None:
+        """Replace a result's subtitles, e.g. after aligning more words."""
+        directory = self._dir(handle)
+        meta = self.meta(handle)
+        if meta is None:
+            raise FileNotFoundError(f"No result {handle}")
+        meta = {**meta, "cue_count": self._write_srt(directory, srt_content)}
+        (directory / "segments.json").write_text(json.dumps(segments, ensure_ascii=False), encoding="utf-8")
+        if alignment is not None:
+            (directory / "alignment.json").write_text(json.dumps(alignment, ensure_ascii=False), encoding="utf-8")
+        (directory / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        self._cache.discard_prefix(handle)
+
+    def meta(self, handle: str) -> Optional[Dict]:
+        """Small metadata dict, or None if the result expired or never existed."""
+        cached = self._cache.get((handle, "meta"))
+        if cached is not None:
+            return cached
+        try:
+            with open(self._dir(handle) / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._cache.put((handle, "meta"), meta, 512)
+        return meta
+
+    def cues(self, handle: str, start: int, count: int) -> str:
+        """SRT text of cues [start, start + count), read straight from disk."""
+        key = (handle, "cues", start, count)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        directory = self._dir(handle)
+        with open(directory / "cues.idx", "rb") as index_file:
+            n_offsets = os.fstat(index_file.fileno()).st_size // OFFSET.size
+            start = max(0, min(start, n_offsets - 1))
+            end = max(start, min(start + count, n_offsets - 1))
+            index_file.seek(start * OFFSET.size)
+            begin, = OFFSET.unpack(index_file.read(OFFSET.size))
+            index_file.seek(end * OFFSET.size)
+            finish, = OFFSET.unpack(index_file.read(OFFSET.size))
+        with open(directory / "subtitles.srt", "rb") as srt_file:
+            srt_file.seek(begin)
+            page = srt_file.read(finish - begin).decode("utf-8")
+
+        self._cache.put(key, page, len(page) * 2)
+        return page
+
+    def srt_bytes(self, handle: str) -> bytes:
+        """Whole SRT file, e.g. for download; shared between sessions through the cache."""
+        cached = self._cache.get((handle, "srt"))
+        if cached is not None:
+            return cached
+        data = (self._dir(handle) / "subtitles.srt").read_bytes()
+        self._cache.put((handle, "srt"), data, len(data))
+        return data
+
+    def text(self, handle: str) -> str:
+        """Full transcribed text."""
+        cached = self._cache.get((handle, "text"))
+        if cached is not None:
+            return cached
+        text = (self._dir(handle) / "text.txt").read_text(encoding="utf-8")
+        self._cache.put((handle, "text"), text, len(text) * 2)
+        return text
+
+    def delete(self, handle: str) -> None:
+        self._cache.discard_prefix(handle)
+        shutil.rmtree(self._dir(handle), ignore_errors=True)
+
+    def prune(self) -> None:
+        """Delete results older than the retention period."""
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            directories = list(self.root.iterdir())
+        except OSError:
+            return
+        for directory in directories:
+            try:
+                if directory.stat().st_mtime < cutoff:
+                    self.delete(directory.name)
+            except (OSError, ValueError):
+                pass
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """Process-wide result store shared by all sessions."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
@@ -1,15 +1,16 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import timedelta
-import re
 
 from config.settings import MAX_CHARS_PER_LINE, MAX_SUBTITLE_DURATION, MIN_SUBTITLE_DURATION
+from text_normalizer import TextNormalizer, get_text_normalizer
 
 
 class SRTGenerator:
-    def __init__(self):
+    def __init__(self, normalizer: Optional[TextNormalizer] = None):
         self.max_chars = MAX_CHARS_PER_LINE
         self.max_duration = MAX_SUBTITLE_DURATION
         self.min_duration = MIN_SUBTITLE_DURATION
+        self.normalizer = normalizer or get_text_normalizer()
     
     def format_timestamp(self, seconds: float) -> str:
         """Convert seconds to SRT timestamp format (HH:MM:SS,mmm)."""
@@ -82,43 +83,44 @@ class SRTGenerator:
     
     def clean_text(self, text: str) -> str:
         """Clean and format text for subtitles."""
-        # Remove multiple spaces
-        text = re.sub(r'\s+', ' ', text)
-        # Remove leading/trailing whitespace
-        text = text.strip()
-        # Ensure proper capitalization after sentence endings
-        text = re.sub(r'([.!?])\s*([a-z])', lambda m: m.group(1) + ' ' + m.group(2).upper(), text)
-        return text
+        return self.normalizer.normalize([text])[0]
     
-    def generate_srt(self, segments: List[Dict], mode: str = "sentence") -> str:
-        """Generate SRT file content from segments."""
+    def build_cues(self, segments: List[Dict], mode: str = "sentence") -> List[Dict]:
+        """Subtitle cues (index, start, end, normalized text) as they will appear in the SRT file."""
         if not segments:
-            return ""
+            return []
         
         # Handle different timestamp modes
-        if mode == "word":
-            # Group words into readable subtitle chunks
+        if mode in ["word", "word_lazy"]:
+            # Group words (and whole short segments in word_lazy) into readable subtitle chunks
             segments = self.group_words_into_subtitles(segments)
         elif mode == "word_precise":
             # Use individual words as-is for precise timestamps (no grouping)
             pass
         
-        srt_lines = []
+        # Clean, normalize and apply the glossary to all cues in one pass
+        texts = self.normalizer.normalize([segment.get("text", "") for segment in segments])
         
-        for idx, segment in enumerate(segments, 1):
+        return [
+            {"index": idx, "start": segment["start"], "end": segment["end"], "text": text}
+            for idx, (segment, text) in enumerate(zip(segments, texts), 1)
             # Skip segments with no text
-            if not segment.get("text", "").strip():
-                continue
-            
-            # Clean text
-            text = self.clean_text(segment["text"])
+            if text
+        ]
+    
+    def format_cues(self, cues: List[Dict]) -> str:
+        """SRT file content for cues from build_cues."""
+        srt_lines = []
+        
+        for cue in cues:
+            text = cue["text"]
             
             # Format timestamps
-            start_time = self.format_timestamp(segment["start"])
-            end_time = self.format_timestamp(segment["end"])
+            start_time = self.format_timestamp(cue["start"])
+            end_time = self.format_timestamp(cue["end"])
             
             # Build SRT entry
-            srt_lines.append(str(idx))
+            srt_lines.append(str(cue["index"]))
             srt_lines.append(f"{start_time} --> {end_time}")
             
             # Split long lines if necessary
@@ -136,16 +138,20 @@ class SRTGenerator:
                         line2.append(word)
                 
                 if line1:
-                    srt_lines.append(" ".join(line1))
+                    srt_lines.append(self.normalizer.format_line(" ".join(line1)))
                 if line2:
-                    srt_lines.append(" ".join(line2))
+                    srt_lines.append(self.normalizer.format_line(" ".join(line2)))
             else:
-                srt_lines.append(text)
+                srt_lines.append(self.normalizer.format_line(text))
             
             srt_lines.append("")  # Blank line between entries
         
         return "\n".join(srt_lines)
     
+    def generate_srt(self, segments: List[Dict], mode: str = "sentence") -> str:
+        """Generate SRT file content from segments."""
+        return self.format_cues(self.build_cues(segments, mode))
+    
     def validate_srt(self, srt_content: str) -> bool:
         """Validate SRT file format."""
         if not srt_content:
@@ -0,0 +1,240 @@
+"""Subtitle text normalization: cleanup, Hebrew normalization and glossary.
+
+All cue texts of a file are joined into one string and normalized in a single
+pass (a few compiled regexes and one glossary scan over the whole text), then
+split back into cues. Steps, in order:
+
+- whitespace collapsed, as SRTGenerator.clean_text always did
+- niqqud and cantillation marks stripped
+- final letters fixed: a regular form at the end of a word becomes final
+  (כ→ך, מ→ם, נ→ן, פ→ף, צ→ץ) and a final form inside a word becomes regular
+- glossary corrections (GLOSSARY_PATH), whole words, leftmost-longest;
+  terms marked ``prefix`` also match after attached Hebrew prefix letters
+- no space before punctuation, capital letter after a sentence end
+
+On output, lines containing Hebrew start with a right-to-left mark so players
+that default to left-to-right put trailing punctuation on the correct side.
+"""
+import csv
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import (
+    GLOSSARY_PATH, NORMALIZE_FINAL_LETTERS, NORMALIZE_RTL_PUNCTUATION, NORMALIZE_STRIP_NIQQUD
+)
+
+logger = logging.getLogger(__name__)
+
+RLM = "\u200f"
+HEBREW_LETTERS = "\u05d0-\u05ea"
+HEBREW_MARKS = "\u0591-\u05c7"
+GERESH = "'\"\u05f3\u05f4"  # Inside acronyms and loanwords (צה"ל, צ'יפס)
+# One-letter prefixes (ו, ה, ב, כ, ל, מ, ש) written together with the next word
+HEBREW_PREFIXES = frozenset("והבכלמש")
+MAX_PREFIX_LETTERS = 3
+# Third glossary column values that let a term match after prefix letters
+PREFIX_FLAGS = frozenset({"prefix", "yes", "true", "1"})
+
+TO_FINAL = {"כ": "ך", "מ": "ם", "נ": "ן", "פ": "ף", "צ": "ץ"}
+FROM_FINAL = {final: regular for regular, final in TO_FINAL.items()}
+
+# Points and cantillation; maqaf, paseq, sof pasuq and nun hafukha are punctuation and stay
+_NIQQUD = re.compile("[\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]+")
+_WORD = re.compile(rf"([\w{HEBREW_MARKS}]+(?:[{GERESH}][\w{HEBREW_MARKS}]+)*)")
+_REGULAR_AT_WORD_END = re.compile(rf"(?<=[{HEBREW_LETTERS}])[כמנפצ](?![{HEBREW_LETTERS}{HEBREW_MARKS}{GERESH}])")
+_FINAL_INSIDE_WORD = re.compile(rf"[ךםןףץ](?=[{HEBREW_MARKS}]*[{HEBREW_LETTERS}])")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r" (?=[.,!?:;])")  # Whitespace is already collapsed
+_SENTENCE_START = re.compile(r"([.!?]) +([a-z])")  # Not inside e.g. "node.js"
+_HEBREW = re.compile(f"[{HEBREW_LETTERS}]")
+
+_END = None  # Trie key holding the replacement of a term ending at that node
+
+
+def _separator_key(separator: str) -> str:
+    """Runs of spaces compare equal; a cue break (newline) never matches."""
+    if separator.isspace() and "\n" not in separator:
+        return " "
+    return separator
+
+
+class Glossary:
+    """Whole-word term corrections compiled into a word-level trie.
+
+    Terms are split into words the same way as the text, so one dict lookup
+    per word finds every term starting there; the longest matching term wins
+    and matching resumes after it (leftmost-longest). Matching ignores case.
+
+    Entries are (term, replacement) or (term, replacement, allow_prefixes).
+    Only terms that allow it also match after attached Hebrew prefix letters,
+    which are kept ("בגוגל" with גוגל→Google becomes "ב-Google"): for most
+    terms, names especially, that would change ordinary words ("שרון" is not
+    "ש" + "רון").
+    """
+
+    def __init__(self, entries: Iterable[Tuple], normalize=None):
+        self._root: Dict = {}
+        self._prefixed_root: Dict = {}  # Terms that also match after prefix letters
+        self.size = 0
+        for term, replacement, *options in entries:
+            term = " ".join(term.split())
+            if normalize:
+                term = normalize(term)
+            replacement = " ".join(replacement.split())
+            parts = _WORD.split(term)
+            if len(parts) < 3 or parts[0] or parts[-1]:
+                # Empty, or starting/ending with punctuation: can't be matched as whole words
+                logger.warning("Skipping glossary term %r", term)
+                continue
+            roots = [self._root] + ([self._prefixed_root] if options and options[0] else [])
+            for root in roots:
+                node = root.setdefault(parts[1].lower(), {})
+                for i in range(3, len(parts), 2):
+                    node = node.setdefault((_separator_key(parts[i - 1]), parts[i].lower()), {})
+                if root is self._root and _END not in node:
+                    self.size += 1
+                node[_END] = replacement
+
+    @classmethod
+    def from_file(cls, path: Path, normalize=None) -> "Glossary":
+        """Load ``term,replacement[,prefix]`` rows from a CSV file (tab-separated for .tsv); # starts a comment."""
+        delimiter = "\t" if Path(path).suffix.lower() == ".tsv" else ","
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = [
+                row for row in csv.reader(f, delimiter=delimiter)
+                if row and not row[0].lstrip().startswith("#")
+            ]
+        return cls((
+            (row[0], row[1], len(row) > 2 and row[2].strip().lower() in PREFIX_FLAGS)
+            for row in rows if len(row) >= 2 and row[0].strip()
+        ), normalize)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _longest(self, node: Dict, parts: List[str], i: int) -> Optional[Tuple[int, str]]:
+        """Longest term from trie ``node`` (its first word at parts[i]): (index of its last word, replacement)."""
+        best = None
+        j = i
+        while node is not None:
+            if _END in node:
+                best = (j, node[_END])
+            if j + 2 >= len(parts):
+                break
+            node = node.get((_separator_key(parts[j + 1]), parts[j + 2].lower()))
+            j += 2
+        return best
+
+    def _starts(self, word: str) -> List[Tuple[Dict, str]]:
+        """(trie node, prefix letters) of every term that may start at ``word``, the whole word first."""
+        starts = []
+        node = self._root.get(word.lower())
+        if node is not None:
+            starts.append((node, ""))
+        for k in range(1, min(MAX_PREFIX_LETTERS, len(word) - 2) + 1):
+            if word[k - 1] not in HEBREW_PREFIXES:
+                break
+            node = self._prefixed_root.get(word[k:].lower())
+            if node is not None:
+                starts.append((node, word[:k]))
+        return starts
+
+    def apply(self, text: str) -> str:
+        if not self._root:
+            return text
+        # [separator, word, separator, word, ..., separator]
+        parts = _WORD.split(text)
+        words = parts[1::2]
+        # Trie lookups once per distinct word, then only at the positions of candidates
+        starts = {}
+        for word in set(words):
+            candidates = self._starts(word)
+            if candidates:
+                starts[word] = candidates
+
+        out = []
+        done = 0  # parts[:done] are already in out
+        for index in [i for i, word in enumerate(words) if word in starts]:
+            i = 2 * index + 1
+            if i < done:
+                continue  # Inside the previous match
+            for node, prefix in starts[parts[i]]:
+                match = self._longest(node, parts, i)
+                if match is not None:
+                    break
+            else:
+                continue
+            end, replacement = match
+            if prefix and not _HEBREW.match(replacement):
+                prefix += "-"
+            out.extend(parts[done:i])
+            out.append(prefix + replacement)
+            done = end + 1
+        out.extend(parts[done:])
+        return "".join(out)
+
+
+class TextNormalizer:
+    """Normalizes all cue texts of a file in one pass."""
+
+    def __init__(self, glossary: Optional[Glossary] = None, strip_niqqud: bool = NORMALIZE_STRIP_NIQQUD,
+                 final_letters: bool = NORMALIZE_FINAL_LETTERS, rtl_punctuation: bool = NORMALIZE_RTL_PUNCTUATION):
+        self.glossary = glossary
+        self.strip_niqqud = strip_niqqud
+        self.final_letters = final_letters
+        self.rtl_punctuation = rtl_punctuation
+
+    def normalize_hebrew(self, text: str) -> str:
+        """Niqqud and final-letter normalization only; also applied to glossary terms."""
+        if self.strip_niqqud:
+            text = _NIQQUD.sub("", text)
+        if self.final_letters:
+            text = _REGULAR_AT_WORD_END.sub(lambda m: TO_FINAL[m.group()], text)
+            text = _FINAL_INSIDE_WORD.sub(lambda m: FROM_FINAL[m.group()], text)
+        return text
+
+    def normalize(self, texts: List[str]) -> List[str]:
+        """Normalized copies of ``texts``, in the same order."""
+        if not texts:
+            return []
+        text = "\n".join(" ".join(t.split()) for t in texts)
+        text = self.normalize_hebrew(text)
+        if self.glossary:
+            text = self.glossary.apply(text)
+        text = _SPACE_BEFORE_PUNCTUATION.sub("", text)
+        text = _SENTENCE_START.sub(lambda m: m.group(1) + " " + m.group(2).upper(), text)
+        return text.split("\n")
+
+    def format_line(self, line: str) -> str:
+        """A subtitle line as written to the SRT file."""
+        if self.rtl_punctuation and _HEBREW.search(line):
+            return RLM + line
+        return line
+
+
+_normalizer: Optional[TextNormalizer] = None
+_normalizer_key = None
+_normalizer_lock = threading.Lock()
+
+
+def get_text_normalizer() -> TextNormalizer:
+    """Process-wide normalizer; the glossary is reloaded when GLOSSARY_PATH changes on disk."""
+    global _normalizer, _normalizer_key
+    try:
+        key = os.stat(GLOSSARY_PATH).st_mtime_ns if GLOSSARY_PATH else None
+    except OSError as e:
+        logger.warning("Glossary %s not available: %s", GLOSSARY_PATH, e)
+        key = None
+    with _normalizer_lock:
+        if _normalizer is None or key != _normalizer_key:
+            normalizer = TextNormalizer()
+            if key is not None:
+                normalizer.glossary = Glossary.from_file(Path(GLOSSARY_PATH), normalizer.normalize_hebrew)
+                logger.info("Loaded %d glossary terms from %s", len(normalizer.glossary), GLOSSARY_PATH)
+            _normalizer, _normalizer_key = normalizer, key
+        return _normalizer
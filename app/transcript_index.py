@@ -0,0 +1,401 @@
+"""Searchable archive of finished transcripts.
+
+Every finished job's subtitle cues are added to one SQLite database: a row per
+transcript, a row per cue (start/end in milliseconds and text) and an FTS5
+inverted index over the cue text. Indexing a transcript is one transaction,
+so the archive grows as jobs complete; indexing the same source again
+replaces it.
+
+Cue text is indexed after the niqqud/final-letter normalization of
+text_normalizer. A second indexed column holds words with attached Hebrew
+prefix letters removed, so searching "גוגל" also finds "בגוגל".
+
+    python app/transcript_index.py search "מה שנאמר"
+    python app/transcript_index.py index ~/Subtitles      # backfill existing SRT files
+    python app/transcript_index.py index-results --watch 30  # results of distributed workers
+    python app/transcript_index.py stats
+
+The database uses SQLite's WAL mode, which needs local storage: keep it on
+one host. Distributed workers don't write to it; ``index-results`` imports
+their results from the shared storage directory instead.
+
+Search syntax: words must all appear in a cue; "quoted words" must appear
+together, in order; a trailing * matches word prefixes (תמלול*).
+"""
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from text_normalizer import HEBREW_PREFIXES, MAX_PREFIX_LETTERS, RLM, get_text_normalizer
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import SHARED_STORAGE_DIR, TRANSCRIPT_INDEX_ENABLED, TRANSCRIPT_INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+_GERSHAYIM = re.compile(r'(?<=[א-ת])"(?=[א-ת])')  # צה"ל is a word, not a phrase
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+_SRT_TIMESTAMP = re.compile(
+    r"(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})"
+)
+
+
+def prefix_variants(text: str) -> str:
+    """Words of ``text`` that start with prefix letters, with 1-3 of those letters removed."""
+    variants = []
+    for word in _TOKEN.findall(text):
+        for k in range(1, min(MAX_PREFIX_LETTERS, len(word) - 2) + 1):
+            if word[k - 1] not in HEBREW_PREFIXES:
+                break
+            variants.append(word[k:])
+    return " ".join(variants)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Turn a search box query into an FTS5 MATCH expression; None if it has no words."""
+    normalize = get_text_normalizer().normalize_hebrew
+    terms = []
+    for phrase, word in _QUERY_PART.findall(_GERSHAYIM.sub("״", query)):
+        tokens = _TOKEN.findall(normalize(phrase or word))
+        if not tokens:
+            continue
+        quoted = '"' + " ".join(tokens) + '"'
+        if phrase:
+            terms.append(f"text : {quoted}")
+        elif word.endswith("*"):
+            terms.append(f"{{text variants}} : {quoted} *")
+        else:
+            terms.append(f"{{text variants}} : {quoted}")
+    return " AND ".join(terms) or None
+
+
+def parse_srt(content: str) -> List[Dict]:
+    """Cues (index, start, end, text) of an SRT file."""
+    cues = []
+    for block in re.split(r"\n\s*\n", content.replace("\r\n", "\n").strip()):
+        lines = [line.replace(RLM, "").strip() for line in block.split("\n")]
+        for i, line in enumerate(lines):
+            match = _SRT_TIMESTAMP.search(line)
+            if not match:
+                continue
+            h1, m1, s1, ms1, h2, m2, s2, ms2 = (int(g) for g in match.groups())
+            text = " ".join(line for line in lines[i + 1:] if line)
+            if text:
+                cues.append({
+                    "index": int(lines[i - 1]) if i > 0 and lines[i - 1].isdigit() else len(cues) + 1,
+                    "start": h1 * 3600 + m1 * 60 + s1 + ms1 / 1000,
+                    "end": h2 * 3600 + m2 * 60 + s2 + ms2 / 1000,
+                    "text": text,
+                })
+            break
+    return cues
+
+
+class TranscriptIndex:
+    """Transcripts and their cues in SQLite, with an FTS5 index over the cue text."""
+
+    def __init__(self, path: Path = TRANSCRIPT_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = self._connect()
+        try:
+            # WAL lets searches run while a finished job is being indexed
+            db.execute("PRAGMA journal_mode = WAL")
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL UNIQUE,
+                    filename TEXT NOT NULL,
+                    duration REAL,
+                    cue_count INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    meta TEXT
+                );
+                CREATE TABLE IF NOT EXISTS cues (
+                    id INTEGER PRIMARY KEY,
+                    transcript_id INTEGER NOT NULL REFERENCES transcripts (id),
+                    cue INTEGER NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS cues_transcript ON cues (transcript_id, cue);
+                -- Contentless: the text is stored once, in cues
+                CREATE VIRTUAL TABLE IF NOT EXISTS cues_fts USING fts5 (
+                    text, variants, content = '', tokenize = 'unicode61 remove_diacritics 2'
+                );
+            """)
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the index safe to share between threads
+        db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    @staticmethod
+    def _fts_rows(rows) -> List[tuple]:
+        return [(row["id"], row["text"], prefix_variants(row["text"])) for row in rows]
+
+    def _delete(self, db: sqlite3.Connection, transcript_id: int) -> None:
+        rows = db.execute("SELECT id, text FROM cues WHERE transcript_id = ?", (transcript_id,)).fetchall()
+        # Contentless FTS rows are removed by replaying the values they were indexed with
+        db.executemany(
+            "INSERT INTO cues_fts (cues_fts, rowid, text, variants) VALUES ('delete', ?, ?, ?)",
+            self._fts_rows(rows)
+        )
+        db.execute("DELETE FROM cues WHERE transcript_id = ?", (transcript_id,))
+        db.execute("DELETE FROM transcripts WHERE id = ?", (transcript_id,))
+
+    def add(self, source: str, filename: str, cues: List[Dict], duration: Optional[float] = None, **meta) -> int:
+        """Index a transcript's cues (index, start, end, text), replacing any earlier one from ``source``."""
+        normalize = get_text_normalizer().normalize_hebrew
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            existing = db.execute("SELECT id FROM transcripts WHERE source = ?", (source,)).fetchone()
+            if existing:
+                self._delete(db, existing["id"])
+            transcript_id = db.execute(
+                "INSERT INTO transcripts (source, filename, duration, cue_count, created, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source, filename, duration, len(cues), time.time(), json.dumps(meta, ensure_ascii=False))
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO cues (transcript_id, cue, start_ms, end_ms, text) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (transcript_id, cue["index"], round(cue["start"] * 1000), round(cue["end"] * 1000),
+                     normalize(" ".join(cue["text"].split())))
+                    for cue in cues
+                ]
+            )
+            rows = db.execute("SELECT id, text FROM cues WHERE transcript_id = ?", (transcript_id,))
+            db.executemany(
+                "INSERT INTO cues_fts (rowid, text, variants) VALUES (?, ?, ?)", self._fts_rows(rows)
+            )
+            db.execute("COMMIT")
+            return transcript_id
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def delete(self, source: str) -> bool:
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            existing = db.execute("SELECT id FROM transcripts WHERE source = ?", (source,)).fetchone()
+            if existing:
+                self._delete(db, existing["id"])
+            db.execute("COMMIT")
+            return existing is not None
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def search(self, query: str, limit: int = 50, offset: int = 0, order: str = "rank") -> List[Dict]:
+        """Matching cues with their transcript and timestamps in milliseconds.
+
+        ``order="rank"`` sorts by relevance (bm25); ``order="recent"`` returns
+        the newest cues first and stays fast for very common words.
+        """
+        expression = build_match_query(query)
+        if expression is None:
+            return []
+        order_by = "cues_fts.rowid DESC" if order == "recent" else "score"
+        db = self._connect()
+        try:
+            rows = db.execute(f"""
+                SELECT t.id AS transcript_id, t.source, t.filename, c.cue, c.start_ms, c.end_ms, c.text,
+                       bm25(cues_fts, 1.0, 0.5) AS score
+                FROM cues_fts
+                JOIN cues c ON c.id = cues_fts.rowid
+                JOIN transcripts t ON t.id = c.transcript_id
+                WHERE cues_fts MATCH ?
+                ORDER BY {order_by}
+                LIMIT ? OFFSET ?
+            """, (expression, limit, offset)).fetchall()
+        finally:
+            db.close()
+        return [dict(row) for row in rows]
+
+    def transcript(self, transcript_id: int) -> Optional[Dict]:
+        db = self._connect()
+        try:
+            row = db.execute("SELECT * FROM transcripts WHERE id = ?", (transcript_id,)).fetchone()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        transcript = dict(row)
+        transcript["meta"] = json.loads(transcript["meta"] or "{}")
+        return transcript
+
+    def cues(self, transcript_id: int, start_cue: int = 0, count: int = -1) -> List[Dict]:
+        """Cues of a transcript from cue number ``start_cue`` on (all by default), e.g. for context or export."""
+        db = self._connect()
+        try:
+            rows = db.execute(
+                "SELECT cue, start_ms, end_ms, text FROM cues WHERE transcript_id = ? AND cue >= ? "
+                "ORDER BY cue LIMIT ?",
+                (transcript_id, start_cue, count)
+            ).fetchall()
+        finally:
+            db.close()
+        return [dict(row) for row in rows]
+
+    def source_meta(self, source: str) -> Optional[Dict]:
+        db = self._connect()
+        try:
+            row = db.execute("SELECT meta FROM transcripts WHERE source = ?", (source,)).fetchone()
+        finally:
+            db.close()
+        return json.loads(row["meta"] or "{}") if row else None
+
+    def stats(self) -> Dict:
+        db = self._connect()
+        try:
+            row = db.execute(
+                "SELECT COUNT(*) AS transcripts, COALESCE(SUM(cue_count), 0) AS cues, "
+                "COALESCE(SUM(duration), 0) / 3600.0 AS hours FROM transcripts"
+            ).fetchone()
+        finally:
+            db.close()
+        return {**dict(row), "bytes": self.path.stat().st_size}
+
+    def optimize(self) -> None:
+        """Merge the FTS index segments; worth running after a large backfill."""
+        db = self._connect()
+        try:
+            db.execute("INSERT INTO cues_fts (cues_fts) VALUES ('optimize')")
+        finally:
+            db.close()
+
+
+_index: Optional[TranscriptIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_transcript_index() -> Optional[TranscriptIndex]:
+    """Process-wide transcript index, or None when disabled in settings."""
+    global _index
+    if not TRANSCRIPT_INDEX_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = TranscriptIndex()
+        return _index
+
+
+def index_transcript(source: str, filename: str, cues: List[Dict], warning_callback=None, **meta) -> None:
+    """Add a finished transcript to the archive. Failures are reported, never raised."""
+    try:
+        index = get_transcript_index()
+        if index is not None:
+            index.add(source, filename, cues, **meta)
+    except Exception as e:
+        (warning_callback or logger.warning)(f"Could not index transcript {source}: {e}")
+
+
+def index_worker_results(index: TranscriptIndex, storage_dir: Path = SHARED_STORAGE_DIR) -> Tuple[int, int]:
+    """Index results written by distributed workers (see worker.py); returns (added, unchanged)."""
+    added = skipped = 0
+    for srt_path in sorted((Path(storage_dir) / "results").glob("*/result.srt")):
+        job_id = srt_path.parent.name
+        source = f"worker:{job_id}"
+        try:
+            mtime = srt_path.stat().st_mtime
+            if (index.source_meta(source) or {}).get("mtime") == mtime:
+                skipped += 1
+                continue
+            details = json.loads((srt_path.parent / "result.json").read_text(encoding="utf-8"))
+            cues = parse_srt(srt_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            # Still being written, or removed meanwhile; picked up on the next run
+            logger.warning("Skipping worker result %s: %s", job_id, e)
+            continue
+        index.add(source, details.get("filename", job_id), cues, details.get("duration"), mtime=mtime,
+                  model=details.get("model"), mode=details.get("mode"), language=details.get("language"))
+        added += 1
+    return added, skipped
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Search and maintain the transcript archive.")
+    parser.add_argument("--db", type=Path, default=TRANSCRIPT_INDEX_PATH, help="Index database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="Find cues")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--offset", type=int, default=0)
+    search.add_argument("--recent", action="store_true", help="Newest first instead of by relevance")
+    search.add_argument("--json", action="store_true", help="Print hits as JSON")
+
+    index_command = commands.add_parser("index", help="Add SRT files (or folders of them) to the archive")
+    index_command.add_argument("paths", nargs="+", type=Path)
+
+    results_command = commands.add_parser("index-results", help="Add results of distributed workers")
+    results_command.add_argument("--storage", type=Path, default=SHARED_STORAGE_DIR, help="Shared storage directory")
+    results_command.add_argument("--watch", type=float, metavar="SECONDS", help="Keep indexing new results")
+
+    commands.add_parser("stats", help="Show archive size")
+    commands.add_parser("optimize", help="Merge index segments")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    index = TranscriptIndex(args.db)
+
+    if args.command == "search":
+        hits = index.search(args.query, args.limit, args.offset, "recent" if args.recent else "rank")
+        if args.json:
+            print(json.dumps(hits, indent=2, ensure_ascii=False))
+        for hit in [] if args.json else hits:
+            seconds, ms = divmod(hit["start_ms"], 1000)
+            print(f"{hit['filename']}  #{hit['cue']}  {seconds // 3600:02d}:{seconds % 3600 // 60:02d}:"
+                  f"{seconds % 60:02d},{ms:03d} ({hit['start_ms']} ms)  {hit['text']}")
+    elif args.command == "index":
+        files = [p for path in args.paths for p in ([path] if path.is_file() else sorted(path.rglob("*.srt")))]
+        added = skipped = 0
+        for path in files:
+            source = f"file:{path.resolve()}"
+            mtime = path.stat().st_mtime
+            if (index.source_meta(source) or {}).get("mtime") == mtime:
+                skipped += 1
+                continue
+            cues = parse_srt(path.read_text(encoding="utf-8-sig", errors="replace"))
+            duration = cues[-1]["end"] if cues else None
+            index.add(source, path.name, cues, duration, mtime=mtime)
+            added += 1
+        print(f"Indexed {added} files ({skipped} unchanged)")
+    elif args.command == "index-results":
+        while True:
+            added, skipped = index_worker_results(index, args.storage)
+            if added or not args.watch:
+                print(f"Indexed {added} worker results ({skipped} unchanged)")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    elif args.command == "stats":
+        stats = index.stats()
+        print(f"{stats['transcripts']} transcripts, {stats['cues']} cues, {stats['hours']:.1f} hours, "
+              f"{stats['bytes'] / (1024 * 1024):.1f} MB")
+    elif args.command == "optimize":
+        index.optimize()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
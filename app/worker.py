@@ -0,0 +1,204 @@
+"""Stateless pipeline worker for distributed mode.
+
+Start as many workers as needed, on any node that can reach the broker and
+the shared storage directory:
+
+    python app/worker.py run
+    python app/worker.py submit lecture.mp4 --mode word
+    python app/worker.py status <job-id>
+
+Inputs are copied into SHARED_STORAGE_DIR/inputs on submit, and results
+(result.srt, result.json) are written to SHARED_STORAGE_DIR/results/<job-id>.
+Workers don't write to the transcript index (SQLite can't be shared over a
+network filesystem); ``transcript_index.py index-results`` on the index host
+picks up their results.
+"""
+import argparse
+import json
+import logging
+import platform
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from broker import Broker, open_broker
+from pipeline import run_pipeline
+from profiling import profiler_for_job
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from config.settings import (
+    BROKER_URL, LOG_LEVEL, SHARED_STORAGE_DIR, SUPPORTED_FORMATS, WHISPER_MODEL,
+    WORKER_HEARTBEAT_SECONDS, WORKER_STALE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def submit_file(broker: Broker, input_path: Path, model_name: str = WHISPER_MODEL, mode: str = "sentence",
+                storage_dir: Path = SHARED_STORAGE_DIR, **options) -> str:
+    """Copy a file into shared storage and queue it. Returns the job id."""
+    extension = input_path.suffix.lower()
+    if extension.lstrip(".") not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported file format: {extension}")
+
+    inputs_dir = storage_dir / "inputs"
+    inputs_dir.mkdir(parents=True, exist_ok=True)
+    # Unique stem keeps extract_audio's output path unique per job
+    stored_name = f"{uuid.uuid4().hex}{extension}"
+    with open(input_path, "rb") as src, open(inputs_dir / stored_name, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    return broker.submit({
+        "input": f"inputs/{stored_name}",
+        "filename": input_path.name,
+        "model": model_name,
+        "mode": mode,
+        "submitted_at": time.time(),
+        **options,
+    })
+
+
+class Worker:
+    """Pulls jobs from a broker and runs the extract/transcribe/SRT pipeline."""
+
+    def __init__(self, broker: Broker, storage_dir: Path = SHARED_STORAGE_DIR, worker_id: Optional[str] = None,
+                 heartbeat_seconds: float = WORKER_HEARTBEAT_SECONDS, stale_seconds: float = WORKER_STALE_SECONDS):
+        self.broker = broker
+        self.storage_dir = storage_dir
+        self.worker_id = worker_id or f"{platform.node()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _heartbeat_loop(self, job_id: str, done: threading.Event) -> None:
+        while not done.wait(self.heartbeat_seconds):
+            try:
+                if not self.broker.heartbeat(job_id, self.worker_id):
+                    logger.warning("Lost ownership of job %s; its result will be discarded", job_id)
+                    return
+            except Exception as e:
+                logger.warning("Heartbeat for job %s failed: %s", job_id, e)
+
+    def process(self, job: Dict) -> None:
+        """Run one claimed job, reporting completion or failure to the broker."""
+        payload = job["payload"]
+        input_path = self.storage_dir / payload["input"]
+        results_dir = self.storage_dir / "results" / job["id"]
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(job["id"], done), daemon=True)
+        heartbeat.start()
+        try:
+            output = run_pipeline(
+                input_path,
+                model_name=payload.get("model", WHISPER_MODEL),
+                mode=payload.get("mode", "sentence"),
+                progress_callback=lambda status, progress, message: logger.info("[%s] %s", job["id"], message),
+                deadline_seconds=payload.get("deadline_seconds"),
+                submitted_at=payload.get("submitted_at"),
+                keep_input=True,  # Needed again if this attempt is lost and re-queued
+                incremental=payload.get("incremental", False),
+                profiler=profiler_for_job(payload.get("profile", False), results_dir / "profile")
+            )
+            results_dir.mkdir(parents=True, exist_ok=True)
+            (results_dir / "result.srt").write_text(output["srt"], encoding="utf-8")
+            (results_dir / "result.json").write_text(json.dumps({
+                "filename": payload.get("filename", input_path.name),
+                "model": output["model"],
+                "mode": output["mode"],
+                "duration": output["duration"],
+                "text": output["text"],
+                "language": output["language"],
+                "segments": output["segments"],
+                "loop_guard": output["loop_guard"],
+                "incremental": output["incremental"],
+            }, ensure_ascii=False), encoding="utf-8")
+        except Exception as e:
+            done.set()
+            logger.error("Job %s failed: %s", job["id"], e)
+            self.broker.fail(job["id"], self.worker_id, str(e))
+            if (self.broker.get(job["id"]) or {}).get("status") == "failed":
+                input_path.unlink(missing_ok=True)
+            return
+        finally:
+            done.set()
+
+        completed = self.broker.complete(job["id"], self.worker_id, {
+            "model": output["model"],
+            "srt": f"results/{job['id']}/result.srt",
+            "json": f"results/{job['id']}/result.json",
+            "worker": self.worker_id,
+        })
+        if completed:
+            input_path.unlink(missing_ok=True)
+
+    def run_once(self) -> bool:
+        """Re-queue stale jobs, then claim and run one job. False if the queue was empty."""
+        for job_id in self.broker.requeue_stale(self.stale_seconds):
+            logger.warning("Re-queued stale job %s", job_id)
+        job = self.broker.claim(self.worker_id)
+        if job is None:
+            return False
+        logger.info("Worker %s claimed job %s (attempt %s)", self.worker_id, job["id"], job["attempts"])
+        self.process(job)
+        return True
+
+    def run_forever(self, poll_seconds: float = 2.0) -> None:
+        logger.info("Worker %s started", self.worker_id)
+        while not self._stopping.is_set():
+            if not self.run_once():
+                self._stopping.wait(poll_seconds)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Distributed transcription worker.")
+    parser.add_argument("--broker", default=BROKER_URL, help="sqlite:///path/to/broker.db or redis://host:6379/0")
+    parser.add_argument("--storage", type=Path, default=SHARED_STORAGE_DIR, help="Shared storage directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("run", help="Process jobs until interrupted")
+
+    submit = commands.add_parser("submit", help="Queue a file")
+    submit.add_argument("input", type=Path)
+    submit.add_argument("--model", default=WHISPER_MODEL)
+    submit.add_argument("--mode", default="sentence", choices=["sentence", "word", "word_precise", "word_lazy"])
+    submit.add_argument("--deadline", type=float, help="Target turnaround in seconds for --model auto")
+    submit.add_argument("--incremental", action="store_true")
+    submit.add_argument("--profile", action="store_true", help="Save stage profiles next to the results")
+
+    status = commands.add_parser("status", help="Show a job")
+    status.add_argument("job_id")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
+    broker = open_broker(args.broker)
+
+    if args.command == "run":
+        worker = Worker(broker, args.storage)
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            worker.stop()
+    elif args.command == "submit":
+        options = {"incremental": args.incremental, "profile": args.profile}
+        if args.deadline is not None:
+            options["deadline_seconds"] = args.deadline
+        print(submit_file(broker, args.input, args.model, args.mode, args.storage, **options))
+    elif args.command == "status":
+        job = broker.get(args.job_id)
+        if job is None:
+            print(f"Unknown job: {args.job_id}", file=sys.stderr)
+            return 1
+        print(json.dumps(job, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Import-time profile of the app and pipeline modules.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` and the
+cumulative time of the module itself is reported, together with the slowest
+dependencies it pulled in. Use ``--budget-ms`` to fail when a module that
+workers and the CLI load is slower than the budget.
+
+    python3 benchmarks/import_time.py
+    python3 benchmarks/import_time.py --budget-ms 150 --top 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+APP_DIR = PROJECT_DIR / "app"
+
+# Modules loaded by API workers and the CLI; these must stay light
+PIPELINE_MODULES = [
+    "audio_processor",
+    "realtime_transcriber",
+    "srt_generator",
+    "model_scheduler",
+    "pipeline",
+    "cli",
+    "utils.file_handler",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_import(module: str):
+    """Return {module_name: cumulative_us} for one cold import of ``module``."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(APP_DIR), str(PROJECT_DIR), env.get("PYTHONPATH", "")])
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(PROJECT_DIR), env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    timings = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            timings[match.group(4)] = int(match.group(2))
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=PIPELINE_MODULES)
+    parser.add_argument("--runs", type=int, default=5, help="Cold imports per module (median is reported)")
+    parser.add_argument("--top", type=int, default=3, help="Slowest dependencies to list per module")
+    parser.add_argument("--budget-ms", type=float, help="Fail if any module's median import exceeds this")
+    args = parser.parse_args()
+
+    over_budget = []
+    print(f"{'module':<24} {'median ms':>10} {'min ms':>8}  slowest dependencies")
+    for module in args.modules:
+        try:
+            runs = [profile_import(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{module:<24} {'error':>10}           {e}")
+            over_budget.append(module)
+            continue
+
+        totals = [run.get(module, 0) / 1000 for run in runs]
+        median = statistics.median(totals)
+        slowest = sorted(
+            ((name, us) for name, us in runs[-1].items() if name != module and "." not in name),
+            key=lambda item: item[1], reverse=True
+        )[:args.top]
+        deps = ", ".join(f"{name} {us / 1000:.1f}" for name, us in slowest)
+        print(f"{module:<24} {median:>10.1f} {min(totals):>8.1f}  {deps}")
+
+        if args.budget_ms is not None and median > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\nOver budget: {', '.join(over_budget)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
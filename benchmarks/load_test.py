@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""Concurrent-load test of the transcription pipeline and HTTP API.
+
+Runs N synthetic jobs of mixed durations and formats at once against a stub
+decoding backend (loop_guard.ScriptedBackend) that "transcribes" at a fixed
+real-time factor, so the rest of the stack (upload, audio extraction, worker
+pool, SRT generation, result files) is exercised for real without a model.
+Reports throughput, latency and queue-wait percentiles, peak memory and
+peak temp-disk usage, for sizing hosts and catching scaling regressions.
+
+    python3 benchmarks/load_test.py --jobs 10
+    python3 benchmarks/load_test.py --target http --jobs 50 --workers 4 --rtf 0.05
+    python3 benchmarks/load_test.py --target http --url http://host:8600 --jobs 20
+    python3 benchmarks/load_test.py --jobs 20 --json report.json --max-p95 120
+
+Targets:
+    pipeline  run_pipeline() in a pool of --workers threads (in-process)
+    http      the aiohttp API: an in-process server using the stub backend,
+              or an already running server given with --url (real model;
+              memory is then not measured)
+
+Requires the ffmpeg binary, like the app itself.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+APP_DIR = PROJECT_DIR / "app"
+sys.path.insert(0, str(APP_DIR))
+sys.path.insert(0, str(PROJECT_DIR))
+# Stub transcripts are indexed like real ones, but not into the real archive
+os.environ.setdefault("TRANSCRIPT_INDEX_PATH", os.path.join(tempfile.mkdtemp(prefix="natan-loadtest-"), "transcripts.db"))
+
+from config.settings import TEMP_DIR, WHISPER_MODEL  # noqa: E402
+from loop_guard import ScriptedBackend  # noqa: E402
+
+SAMPLE_RATE = 16000
+VIDEO_FORMATS = ("mp4", "mov", "avi", "mkv", "webm")
+TERMINAL_EVENTS = ("completed", "failed")
+
+# Pseudo-words so the stub text is not repetitive enough to trip the loop guard
+_vocabulary_rng = random.Random(7)
+VOCABULARY = [
+    "".join(_vocabulary_rng.choice("אבגדהוזחטיכלמנסעפצקרשת") for _ in range(_vocabulary_rng.randint(2, 7)))
+    for _ in range(2000)
+]
+
+
+def stub_script(start: float, end: float, options: Dict) -> List[Dict]:
+    """Segments of 2-6 seconds covering [start, end), with words when asked for."""
+    rng = random.Random(int(start * 1000))
+    segments, position = [], start
+    while position < end - 0.1:
+        segment_end = min(end, position + rng.uniform(2.0, 6.0))
+        words = rng.sample(VOCABULARY, max(1, int((segment_end - position) * 2.5)))
+        segment = {
+            "start": round(position, 2),
+            "end": round(segment_end, 2),
+            "text": " " + " ".join(words),
+            "no_speech_prob": 0.01,
+            "avg_logprob": -0.3,
+        }
+        if options.get("word_timestamps"):
+            step = (segment_end - position) / len(words)
+            segment["words"] = [
+                {"word": " " + word, "start": round(position + i * step, 2),
+                 "end": round(position + (i + 1) * step, 2), "probability": 0.9}
+                for i, word in enumerate(words)
+            ]
+        segments.append(segment)
+        position = segment_end
+    return segments
+
+
+def stub_backend_factory(realtime_factor: float):
+    return lambda model_name: ScriptedBackend(stub_script, realtime_factor=realtime_factor)
+
+
+def make_inputs(directory: Path, durations: List[float], formats: List[str]) -> List[Path]:
+    """Write one synthetic file per (duration, format): tone bursts separated by pauses."""
+    import numpy as np
+
+    directory.mkdir(parents=True, exist_ok=True)
+    inputs = []
+    for duration in durations:
+        wav_path = directory / f"synthetic_{duration:g}s.wav"
+        if not wav_path.exists():
+            with wave.open(str(wav_path), "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(SAMPLE_RATE)
+                # In 10-second blocks, so generating inputs doesn't inflate the peak RSS
+                total = int(duration * SAMPLE_RATE)
+                for offset in range(0, total, 10 * SAMPLE_RATE):
+                    t = np.arange(offset, min(total, offset + 10 * SAMPLE_RATE)) / SAMPLE_RATE
+                    envelope = np.sin(2 * np.pi * 0.4 * t) > -0.3
+                    signal = 0.3 * envelope * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t)
+                    f.writeframes((signal * 32767).astype("<i2").tobytes())
+
+        for extension in formats:
+            path = wav_path.with_suffix(f".{extension}")
+            if not path.exists():
+                if extension in VIDEO_FORMATS:
+                    command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+                               "-i", "color=c=black:s=320x240:r=5", "-i", str(wav_path), "-shortest",
+                               "-c:v", "mpeg4", str(path)]
+                else:
+                    command = ["ffmpeg", "-y", "-loglevel", "error", "-i", str(wav_path), str(path)]
+                subprocess.run(command, check=True)
+            inputs.append(path)
+    return inputs
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass  # Deleted while walking
+    return total
+
+
+class DiskSampler(threading.Thread):
+    """Tracks the peak size of a directory tree while jobs run."""
+
+    def __init__(self, path: Path, interval: float):
+        super().__init__(name="disk-sampler", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.baseline = directory_size(path)
+        self.peak = self.baseline
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, directory_size(self.path))
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+@dataclass
+class JobResult:
+    input: str
+    audio_seconds: float
+    submitted: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.finished is not None
+
+
+def run_pipeline_jobs(inputs: List[Path], durations: Dict[Path, float], args) -> List[JobResult]:
+    """Submit every job at once to a pool of ``--workers`` pipeline threads."""
+    from pipeline import run_pipeline
+
+    backend_factory = stub_backend_factory(args.rtf)
+    jobs_dir = TEMP_DIR / "loadtest"
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def run(source: Path, job: JobResult) -> None:
+        job.started = time.perf_counter()
+        # Each job gets its own copy, like an upload: extraction output is named after the input
+        input_path = jobs_dir / f"{uuid.uuid4().hex}{source.suffix}"
+        shutil.copyfile(source, input_path)
+        try:
+            run_pipeline(input_path, model_name=args.model, mode=args.mode, backend=backend_factory(args.model))
+            job.finished = time.perf_counter()
+        except Exception as e:
+            job.error = str(e)
+
+    jobs = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for i in range(args.jobs):
+            source = inputs[i % len(inputs)]
+            job = JobResult(source.name, durations[source], time.perf_counter())
+            jobs.append(job)
+            executor.submit(run, source, job)
+    return jobs
+
+
+async def _http_job(session, base_url: str, source: Path, job: JobResult, args) -> None:
+    import aiohttp
+
+    params = {"filename": source.name, "mode": args.mode, "model": args.model}
+    try:
+        with open(source, "rb") as f:
+            async with session.post(f"{base_url}/jobs", params=params, data=f) as response:
+                if response.status != 202:
+                    job.error = f"HTTP {response.status}: {await response.text()}"
+                    return
+                created = await response.json()
+
+        status = None
+        async with session.get(f"{base_url}{created['events_url']}",
+                               timeout=aiohttp.ClientTimeout(total=None)) as response:
+            async for line in response.content:
+                line = line.decode("utf-8").strip()
+                if not line.startswith("event:"):
+                    continue
+                status = line.split(":", 1)[1].strip()
+                if status != "queued" and job.started is None:
+                    job.started = time.perf_counter()
+                if status in TERMINAL_EVENTS:
+                    break
+
+        if status != "completed":
+            async with session.get(f"{base_url}/jobs/{created['id']}") as response:
+                job.error = (await response.json()).get("error") or f"ended as {status}"
+            return
+        async with session.get(f"{base_url}{created['srt_url']}") as response:
+            await response.read()
+        job.finished = time.perf_counter()
+    except Exception as e:
+        job.error = str(e)
+
+
+async def run_http_jobs(inputs: List[Path], durations: Dict[Path, float], args) -> List[JobResult]:
+    """Upload every job at once and follow each one's SSE stream to completion."""
+    import aiohttp
+    from aiohttp import web
+
+    runner = None
+    base_url = args.url
+    if base_url is None:
+        from api_server import JOBS_DIR, create_app
+
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        runner = web.AppRunner(create_app(args.workers, stub_backend_factory(args.rtf)))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            jobs, tasks = [], []
+            for i in range(args.jobs):
+                source = inputs[i % len(inputs)]
+                job = JobResult(source.name, durations[source], time.perf_counter())
+                jobs.append(job)
+                tasks.append(_http_job(session, base_url, source, job, args))
+            await asyncio.gather(*tasks)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+    return jobs
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile, q in [0, 100]."""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(jobs: List[JobResult], wall_seconds: float, args, memory: Dict, disk: DiskSampler) -> Dict:
+    done = [job for job in jobs if job.ok]
+    latencies = [job.finished - job.submitted for job in done]
+    waits = [job.started - job.submitted for job in jobs if job.started is not None]
+    audio_seconds = sum(job.audio_seconds for job in done)
+
+    def stats(values):
+        return {f"p{q}": round(percentile(values, q), 3) if values else None for q in (50, 95, 99)}
+
+    return {
+        "target": args.target if args.url is None else f"http {args.url}",
+        "jobs": len(jobs),
+        "completed": len(done),
+        "failed": len(jobs) - len(done),
+        "workers": args.workers,
+        "rtf": args.rtf,
+        "mode": args.mode,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_jobs_per_minute": round(len(done) / wall_seconds * 60, 2),
+        "throughput_audio_x_realtime": round(audio_seconds / wall_seconds, 2),
+        "latency_seconds": stats(latencies),
+        "queue_wait_seconds": stats(waits),
+        "peak_rss_mb": memory,
+        "temp_disk_mb": {
+            "path": str(disk.path),
+            "baseline": round(disk.baseline / (1024 * 1024), 1),
+            "peak": round(disk.peak / (1024 * 1024), 1),
+            "peak_growth": round((disk.peak - disk.baseline) / (1024 * 1024), 1),
+        },
+        "errors": sorted({job.error for job in jobs if job.error}),
+        "per_job": [asdict(job) for job in jobs] if args.per_job else None,
+    }
+
+
+def print_report(report: Dict) -> None:
+    def fmt(values):
+        return "  ".join(f"{k}={v:.2f}s" if v is not None else f"{k}=n/a" for k, v in values.items())
+
+    print(f"Target:      {report['target']} ({report['workers']} workers, stub RTF {report['rtf']}, "
+          f"mode {report['mode']})")
+    print(f"Jobs:        {report['completed']}/{report['jobs']} completed in {report['wall_seconds']:.1f}s")
+    print(f"Throughput:  {report['throughput_jobs_per_minute']} jobs/min, "
+          f"{report['throughput_audio_x_realtime']}x real time")
+    print(f"Latency:     {fmt(report['latency_seconds'])}")
+    print(f"Queue wait:  {fmt(report['queue_wait_seconds'])}")
+    memory = report["peak_rss_mb"]
+    if memory:
+        print(f"Peak RSS:    {memory['after']:.0f} MB (before the run: {memory['before']:.0f} MB)")
+    else:
+        print("Peak RSS:    not measured (external server)")
+    disk = report["temp_disk_mb"]
+    print(f"Temp disk:   peak {disk['peak']:.1f} MB, +{disk['peak_growth']:.1f} MB during the run ({disk['path']})")
+    for error in report["errors"]:
+        print(f"Error:       {error}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["pipeline", "http"], default="pipeline")
+    parser.add_argument("--url", help="Base URL of a running API server (http target only)")
+    parser.add_argument("--jobs", type=int, default=10, help="Number of concurrent jobs")
+    parser.add_argument("--workers", type=int, default=2, help="Pipeline threads (in-process targets)")
+    parser.add_argument("--rtf", type=float, default=0.02, help="Stub real-time factor (seconds per audio second)")
+    parser.add_argument("--durations", default="30,120,600", help="Comma-separated input durations in seconds")
+    parser.add_argument("--formats", default="wav,mp3,m4a,mp4", help="Comma-separated input formats")
+    parser.add_argument("--mode", default="sentence", choices=["sentence", "word", "word_precise"])
+    parser.add_argument("--model", default=WHISPER_MODEL, help="Model name passed through to the pipeline")
+    parser.add_argument("--inputs-dir", type=Path, default=TEMP_DIR / "loadtest-inputs",
+                        help="Where synthetic inputs are generated (reused between runs)")
+    parser.add_argument("--sample-interval", type=float, default=0.25, help="Temp-disk sampling interval")
+    parser.add_argument("--json", dest="json_output", type=Path, help="Also write the report as JSON")
+    parser.add_argument("--per-job", action="store_true", help="Include per-job timings in the JSON report")
+    parser.add_argument("--max-p95", type=float, help="Fail if p95 latency exceeds this many seconds")
+    args = parser.parse_args()
+    if args.url and args.target != "http":
+        parser.error("--url requires --target http")
+
+    durations_list = [float(d) for d in args.durations.split(",")]
+    formats = [f.strip().lower() for f in args.formats.split(",")]
+    inputs = make_inputs(args.inputs_dir, durations_list, formats)
+    durations = {path: float(path.stem.split("_")[1].rstrip("s")) for path in inputs}
+
+    memory_before = peak_rss_mb()
+    disk = DiskSampler(TEMP_DIR, args.sample_interval)
+    disk.start()
+    started = time.perf_counter()
+    try:
+        if args.target == "pipeline":
+            jobs = run_pipeline_jobs(inputs, durations, args)
+        else:
+            jobs = asyncio.run(run_http_jobs(inputs, durations, args))
+    finally:
+        disk.stop()
+    wall_seconds = time.perf_counter() - started
+
+    memory = None if args.url else {"before": round(memory_before, 1), "after": round(peak_rss_mb(), 1)}
+    report = summarize(jobs, wall_seconds, args, memory, disk)
+    print_report(report)
+    if args.json_output:
+        args.json_output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if report["failed"]:
+        return 1
+    p95 = report["latency_seconds"]["p95"]
+    if args.max_p95 is not None and p95 is not None and p95 > args.max_p95:
+        print(f"p95 latency {p95:.2f}s exceeds the {args.max_p95:.2f}s budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Throughput of subtitle text normalization on large synthetic inputs.
+
+Compares, on the same cues:
+
+- legacy: the old per-cue ``clean_text`` (three regex passes per cue)
+- legacy + glossary script: the above plus a per-cue regex alternation of
+  all glossary terms, as a separate post-processing script would do it
+- normalizer: text_normalizer.TextNormalizer, one pass over all cues with
+  niqqud/final-letter normalization and the glossary trie
+
+    python3 benchmarks/normalizer_benchmark.py
+    python3 benchmarks/normalizer_benchmark.py --cues 100000 --terms 5000 --runs 5
+"""
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "app"))
+sys.path.insert(0, str(PROJECT_DIR))
+
+from text_normalizer import TO_FINAL, Glossary, TextNormalizer  # noqa: E402
+
+LETTERS = "אבגדהוזחטיכלמנסעפצקרשת"
+NIQQUD = "ְִֵֶַָֹֻּ"
+
+
+def legacy_clean_text(text: str) -> str:
+    """SRTGenerator.clean_text before the normalizer."""
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip()
+    text = re.sub(r'([.!?])\s*([a-z])', lambda m: m.group(1) + ' ' + m.group(2).upper(), text)
+    return text
+
+
+def make_data(cues: int, terms: int, seed: int = 1):
+    rng = random.Random(seed)
+
+    def word():
+        letters = [rng.choice(LETTERS) for _ in range(rng.randint(2, 7))]
+        # Mostly correct final letters, like real transcripts
+        if rng.random() < 0.98:
+            letters[-1] = TO_FINAL.get(letters[-1], letters[-1])
+        return "".join(letters)
+
+    vocabulary = [word() for _ in range(5000)]
+    glossary = {}
+    while len(glossary) < terms:
+        term = " ".join(word() for _ in range(rng.choice((1, 1, 1, 2, 3))))
+        glossary[term] = f"Term{len(glossary)}"
+    glossary_terms = list(glossary)
+
+    texts = []
+    for _ in range(cues):
+        words = rng.choices(vocabulary, k=rng.randint(4, 10))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(glossary_terms))
+        if rng.random() < 0.1:
+            words[0] = "".join(c + rng.choice(NIQQUD) for c in words[0])
+        texts.append(" " + "  ".join(words) + rng.choice((".", ",", " ?", "")))
+    return texts, glossary
+
+
+def legacy_with_glossary(glossary):
+    lookup = {term.lower(): replacement for term, replacement in glossary.items()}
+    pattern = re.compile(
+        r"(?<!\w)(" + "|".join(re.escape(t) for t in sorted(lookup, key=len, reverse=True)) + r")(?!\w)",
+        re.IGNORECASE
+    )
+
+    def run(texts):
+        return [pattern.sub(lambda m: lookup[m.group(1).lower()], legacy_clean_text(t)) for t in texts]
+    return run
+
+
+def best_of(function, texts, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function(texts)
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cues", type=int, default=100_000)
+    parser.add_argument("--terms", type=int, default=5_000, help="Glossary size")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    texts, glossary = make_data(args.cues, args.terms)
+
+    started = time.perf_counter()
+    normalizer = TextNormalizer(rtl_punctuation=True)
+    normalizer.glossary = Glossary(glossary.items(), normalizer.normalize_hebrew)
+    build_seconds = time.perf_counter() - started
+
+    candidates = [
+        ("legacy clean_text", lambda t: [legacy_clean_text(x) for x in t]),
+        ("legacy + glossary script", legacy_with_glossary(glossary)),
+        ("normalizer (no glossary)", TextNormalizer().normalize),
+        ("normalizer + glossary", normalizer.normalize),
+    ]
+
+    print(f"{args.cues:,} cues, {len(normalizer.glossary):,} glossary terms "
+          f"(trie built in {build_seconds * 1000:.0f} ms), best of {args.runs}")
+    print(f"{'':28} {'best':>9} {'median':>9} {'cues/s':>12}")
+    for name, function in candidates:
+        best, median = best_of(function, texts, args.runs)
+        print(f"{name:28} {best:8.3f}s {median:8.3f}s {args.cues / best:12,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
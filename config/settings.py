@@ -8,24 +8,98 @@ load_dotenv()
 WHISPER_MODEL = os.getenv("WHISPER_MODEL", "mlx-community/whisper-large-v3-turbo")
 WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "12"))
 
+# Models ordered from least to most accurate, with a prior real-time factor
+# (processing seconds per audio second) used until measurements exist
+WHISPER_MODELS_BY_ACCURACY = [
+    "mlx-community/whisper-tiny",
+    "mlx-community/whisper-small",
+    "mlx-community/whisper-medium",
+    "mlx-community/whisper-large-v3-turbo",
+    "mlx-community/whisper-large-v3",
+]
+DEFAULT_REALTIME_FACTORS = {
+    "mlx-community/whisper-tiny": 0.03,
+    "mlx-community/whisper-small": 0.06,
+    "mlx-community/whisper-medium": 0.15,
+    "mlx-community/whisper-large-v3-turbo": 0.06,
+    "mlx-community/whisper-large-v3": 0.3,
+}
+MODEL_STATS_PATH = Path(os.path.expanduser(os.getenv("MODEL_STATS_PATH", "~/.natan-transcribe/model_stats.json")))
+
+# Repetition / hallucination loop guard
+LOOP_GUARD_ENABLED = os.getenv("LOOP_GUARD_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_GUARD_WINDOW_SECONDS = float(os.getenv("LOOP_GUARD_WINDOW_SECONDS", "30"))
+LOOP_COMPRESSION_RATIO = 2.4  # gzip ratio above which text is considered repetitive (Whisper's default)
+LOOP_NGRAM_REPETITION = 0.5  # Share of repeated word trigrams in recent text
+LOOP_NO_SPEECH_PROB = 0.6  # With a low avg_logprob, marks text hallucinated over silence
+LOOP_REPEATED_SEGMENTS = 3  # Identical consecutive segments that count as a loop
+
 # Streamlit Configuration
 STREAMLIT_PORT = int(os.getenv("STREAMLIT_PORT", "8501"))
 STREAMLIT_MAX_UPLOAD_SIZE = int(os.getenv("STREAMLIT_MAX_UPLOAD_SIZE", "10000"))  # 10GB max for local use
 
+# HTTP API Configuration
+API_HOST = os.getenv("API_HOST", "localhost")
+API_PORT = int(os.getenv("API_PORT", "8600"))
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))  # Concurrent pipeline jobs per API process
+API_JOB_TTL_SECONDS = float(os.getenv("API_JOB_TTL_SECONDS", "86400"))  # Finished jobs and their files are kept this long
+API_MAX_UPLOAD_SIZE = int(os.getenv("API_MAX_UPLOAD_SIZE", "10000"))  # MB, like STREAMLIT_MAX_UPLOAD_SIZE
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read per chunk when streaming uploads to disk
+
+# Distributed workers
+BROKER_URL = os.getenv("BROKER_URL", "sqlite://" + os.path.expanduser("~/.natan-transcribe/shared/broker.db"))
+SHARED_STORAGE_DIR = Path(os.path.expanduser(os.getenv("SHARED_STORAGE_DIR", "~/.natan-transcribe/shared")))
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "10"))
+WORKER_STALE_SECONDS = float(os.getenv("WORKER_STALE_SECONDS", "60"))  # Jobs without a heartbeat this long are re-queued
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+
 # File Processing
 TEMP_DIR = Path(os.getenv("TEMP_DIR", "/tmp/natan-transcribe"))
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
 MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "10000"))  # 10GB max for local use
 
+# Finished results kept on disk; sessions only hold a handle
+RESULT_STORE_DIR = Path(os.getenv("RESULT_STORE_DIR", str(TEMP_DIR / "results")))
+RESULT_TTL_HOURS = float(os.getenv("RESULT_TTL_HOURS", "24"))
+RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", "64"))  # In-memory cache shared by all sessions
+PREVIEW_CUES_PER_PAGE = 20
+
+# Log-mel feature cache (memory-mapped float16 arrays keyed by audio content hash)
+FEATURE_CACHE_ENABLED = os.getenv("FEATURE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FEATURE_CACHE_DIR = Path(os.getenv("FEATURE_CACHE_DIR", str(TEMP_DIR / "features")))
+FEATURE_CACHE_MAX_GB = float(os.getenv("FEATURE_CACHE_MAX_GB", "10"))
+
+# Incremental re-transcription (content-defined chunks of the extracted PCM)
+INCREMENTAL_STORE_DIR = Path(os.path.expanduser(os.getenv("INCREMENTAL_STORE_DIR", "~/.natan-transcribe/chunks")))
+INCREMENTAL_STORE_MAX_MB = float(os.getenv("INCREMENTAL_STORE_MAX_MB", "500"))  # Least recently used chunks go first
+CDC_AVG_SECONDS = 60  # Average chunk length
+CDC_MIN_SECONDS = 20
+CDC_MAX_SECONDS = 180
+
+# Searchable archive of finished transcripts (SQLite FTS5)
+TRANSCRIPT_INDEX_ENABLED = os.getenv("TRANSCRIPT_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+TRANSCRIPT_INDEX_PATH = Path(os.path.expanduser(os.getenv("TRANSCRIPT_INDEX_PATH", "~/.natan-transcribe/transcripts.db")))
+
 # Supported file formats
 SUPPORTED_VIDEO_FORMATS = ["mp4", "avi", "mov", "mkv", "webm"]
 SUPPORTED_AUDIO_FORMATS = ["mp3", "wav", "m4a", "flac", "aac", "ogg"]
 SUPPORTED_FORMATS = SUPPORTED_VIDEO_FORMATS + SUPPORTED_AUDIO_FORMATS
 
+# Per-job profiling (also enabled with ?profile=1 or --profile)
+PROFILE_JOBS = os.getenv("PROFILE_JOBS", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(TEMP_DIR / "profiles")))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # seconds
+
 # Service Configuration
 SERVICE_NAME = os.getenv("SERVICE_NAME", "com.natan.transcribe")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+# Subtitle text normalization
+GLOSSARY_PATH = os.getenv("GLOSSARY_PATH", "")  # CSV (or .tsv) of term,replacement rows; empty disables
+NORMALIZE_STRIP_NIQQUD = os.getenv("NORMALIZE_STRIP_NIQQUD", "true").lower() in ("1", "true", "yes")
+NORMALIZE_FINAL_LETTERS = os.getenv("NORMALIZE_FINAL_LETTERS", "true").lower() in ("1", "true", "yes")
+NORMALIZE_RTL_PUNCTUATION = os.getenv("NORMALIZE_RTL_PUNCTUATION", "true").lower() in ("1", "true", "yes")
+
 # SRT Configuration
 MAX_CHARS_PER_LINE = 42
 MAX_SUBTITLE_DURATION = 7.0  # seconds
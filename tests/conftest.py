@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "app"))
+sys.path.insert(0, str(PROJECT_DIR))
@@ -0,0 +1,150 @@
+import time
+
+import fakeredis
+import pytest
+
+from broker import RedisBroker, SQLiteBroker
+
+
+def _age_sqlite(broker, job_id, seconds):
+    db = broker._connect()
+    try:
+        db.execute("UPDATE jobs SET heartbeat = heartbeat - ? WHERE id = ?", (seconds, job_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _age_redis(broker, job_id, seconds):
+    key = broker._job_key(job_id)
+    broker.client.hset(key, "heartbeat", float(broker.client.hget(key, "heartbeat")) - seconds)
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def broker(request, tmp_path):
+    """A broker with 2 attempts per job, plus ``age(job_id, seconds)`` to backdate its heartbeat."""
+    if request.param == "sqlite":
+        broker = SQLiteBroker(tmp_path / "broker.db", max_attempts=2)
+        broker.age = lambda job_id, seconds: _age_sqlite(broker, job_id, seconds)
+    else:
+        broker = RedisBroker(fakeredis.FakeRedis(), max_attempts=2)
+        broker.age = lambda job_id, seconds: _age_redis(broker, job_id, seconds)
+    return broker
+
+
+def test_claim_heartbeat_complete(broker):
+    job_id = broker.submit({"input": "a.mp4"})
+    assert broker.get(job_id)["status"] == "queued"
+
+    job = broker.claim("w1")
+    assert job["id"] == job_id
+    assert job["payload"] == {"input": "a.mp4"}
+    assert (job["status"], job["worker"], job["attempts"]) == ("running", "w1", 1)
+    assert job["heartbeat"] is not None
+    assert broker.claim("w2") is None
+
+    assert broker.heartbeat(job_id, "w1")
+    assert not broker.heartbeat(job_id, "w2")
+    assert broker.complete(job_id, "w1", {"srt": "out.srt"})
+
+    job = broker.get(job_id)
+    assert (job["status"], job["result"], job["error"]) == ("completed", {"srt": "out.srt"}, None)
+    assert not broker.heartbeat(job_id, "w1")
+    assert broker.requeue_stale(-1) == []
+
+
+def test_jobs_are_claimed_oldest_first(broker):
+    ids = [broker.submit({"n": n}) for n in range(3)]
+    assert [broker.claim("w")["id"] for _ in ids] == ids
+    assert broker.get("unknown") is None
+
+
+def test_stale_job_is_requeued(broker):
+    job_id = broker.submit({})
+    broker.claim("w1")
+    assert broker.requeue_stale(60) == []
+
+    broker.age(job_id, 120)
+    assert broker.requeue_stale(60) == [job_id]
+    job = broker.get(job_id)
+    assert (job["status"], job["worker"], job["heartbeat"]) == ("queued", None, None)
+    assert job["error"] == "Worker heartbeat lost"
+
+    # Claimed again right away: the old heartbeat must not make it look stale
+    job = broker.claim("w2")
+    assert (job["id"], job["worker"], job["attempts"]) == (job_id, "w2", 2)
+    assert broker.requeue_stale(60) == []
+    assert broker.get(job_id)["status"] == "running"
+
+
+def test_job_fails_after_max_attempts(broker):
+    job_id = broker.submit({})
+    broker.claim("w1")
+    assert broker.fail(job_id, "w1", "boom")
+    assert broker.get(job_id)["status"] == "queued"
+
+    broker.claim("w2")
+    broker.age(job_id, 120)
+    assert broker.requeue_stale(60) == [job_id]
+    job = broker.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 2, "Worker heartbeat lost")
+    assert broker.claim("w3") is None
+
+
+def test_completion_from_previous_owner_is_ignored(broker):
+    job_id = broker.submit({})
+    broker.claim("w1")
+    broker.age(job_id, 120)
+    broker.requeue_stale(60)
+    broker.claim("w2")
+
+    # w1 comes back after its job was handed to w2
+    assert not broker.heartbeat(job_id, "w1")
+    assert not broker.complete(job_id, "w1", {"from": "w1"})
+    assert not broker.fail(job_id, "w1", "late")
+    assert broker.get(job_id)["worker"] == "w2"
+
+    assert broker.complete(job_id, "w2", {"from": "w2"})
+    assert broker.get(job_id)["result"] == {"from": "w2"}
+    assert not broker.fail(job_id, "w2", "after completion")
+    assert broker.get(job_id)["status"] == "completed"
+
+
+def test_redis_half_claimed_job_is_recovered():
+    broker = RedisBroker(fakeredis.FakeRedis(), max_attempts=2)
+    job_id = broker.submit({})
+    # A worker that died between moving the id and writing the job fields
+    broker.client.rpoplpush(broker.queue_key, broker.processing_key)
+    broker.client.hset(broker._job_key(job_id), mapping={"status": "running", "updated": time.time() - 120})
+
+    assert broker.requeue_stale(60) == [job_id]
+    assert broker.get(job_id)["status"] == "queued"
+    assert broker.client.lrange(broker.processing_key, 0, -1) == []
+    assert broker.claim("w1")["id"] == job_id
+
+
+def test_redis_claim_is_atomic():
+    broker = RedisBroker(fakeredis.FakeRedis())
+    job_id = broker.submit({})
+
+    class DiesBeforeExec(Exception):
+        pass
+
+    original = broker.client.pipeline
+
+    def pipeline(*args, **kwargs):
+        pipe = original(*args, **kwargs)
+
+        def execute(*args, **kwargs):
+            raise DiesBeforeExec()
+        pipe.execute = execute
+        return pipe
+
+    broker.client.pipeline = pipeline
+    with pytest.raises(DiesBeforeExec):
+        broker.claim("w1")
+    broker.client.pipeline = original
+
+    # Nothing was applied: the job is still queued and claimable
+    assert broker.client.lrange(broker.processing_key, 0, -1) == []
+    assert broker.claim("w2")["id"] == job_id
@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+import feature_cache
+from feature_cache import FeatureCache, cached_features
+
+
+class FakeMel:
+    """Stands in for log_mel_spectrogram: a deterministic spectrogram per file, counting calls."""
+
+    def __init__(self, frames: int = 500):
+        self.frames = frames
+        self.calls = []
+
+    def __call__(self, audio, n_mels=80, padding=0):
+        self.calls.append(audio)
+        seed = sum(open(audio, "rb").read()) if isinstance(audio, str) else 0
+        return np.random.default_rng(seed).standard_normal((self.frames + padding, n_mels)).astype(np.float32)
+
+
+@pytest.fixture
+def audio_files(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"audio{i}.wav"
+        path.write_bytes(bytes([i + 1]) * 1000)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def fake_mlx(monkeypatch):
+    monkeypatch.setitem(sys.modules, "mlx", types.ModuleType("mlx"))
+    monkeypatch.setitem(sys.modules, "mlx.core", types.SimpleNamespace(array=np.array))
+
+
+def test_round_trip_is_memory_mapped_and_sliced(tmp_path, audio_files, fake_mlx):
+    compute = FakeMel()
+    cache = FeatureCache(tmp_path / "features")
+    expected = compute(str(audio_files[0]), n_mels=128, padding=100).astype(np.float16)
+    compute.calls.clear()
+
+    view = cache.get_or_compute(audio_files[0], 128, 100, compute=compute)
+    again = cache.get_or_compute(audio_files[0], 128, 100, compute=compute)
+
+    assert len(compute.calls) == 1
+    assert isinstance(again.frames, np.memmap)
+    assert view.shape == (600, 128) and view.ndim == 2 and view.dtype == np.float16
+    assert np.array_equal(view.window(250, 3000), expected[250:])
+    assert np.array_equal(again[10:20], expected[10:20])
+    # Other mel bins or padding are separate entries
+    assert cache.get(audio_files[0], 80, 100) is None
+    assert cache.get(audio_files[0], 128, 0) is None
+
+
+def test_content_key_follows_content_not_path(tmp_path, audio_files):
+    cache = FeatureCache(tmp_path / "features")
+    copy = tmp_path / "copy.wav"
+    copy.write_bytes(audio_files[0].read_bytes())
+    assert cache.content_key(copy) == cache.content_key(audio_files[0])
+
+    audio_files[0].write_bytes(b"changed")
+    assert cache.content_key(copy) != cache.content_key(audio_files[0])
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, audio_files):
+    compute = FakeMel(frames=1000)
+    entry_bytes = 1000 * 80 * 2
+    cache = FeatureCache(tmp_path / "features", max_bytes=int(2.5 * entry_bytes))
+    for age, path in enumerate(audio_files[:2]):
+        cache.get_or_compute(path, 80, compute=compute)
+        npy = cache.path_for(cache.content_key(path), 80, 0)
+        os.utime(npy, (1000 + age, 1000 + age))
+    assert cache.get(audio_files[0], 80) is not None  # Now the most recently used
+
+    cache.get_or_compute(audio_files[2], 80, compute=compute)
+
+    assert [cache.get(path, 80) is not None for path in audio_files[:3]] == [True, False, True]
+    assert not list((tmp_path / "features").glob("*.tmp.npy"))
+
+
+def test_hook_serves_only_the_active_file_in_the_active_thread(tmp_path, audio_files, monkeypatch):
+    original = FakeMel()
+    transcribe_module = types.SimpleNamespace(log_mel_spectrogram=original)
+    monkeypatch.setitem(sys.modules, "mlx_whisper.transcribe", transcribe_module)
+    monkeypatch.setattr(feature_cache, "FEATURE_CACHE_ENABLED", True)
+    monkeypatch.setattr(feature_cache, "_original", None)
+    monkeypatch.setattr(feature_cache, "_cache", FeatureCache(tmp_path / "features"))
+    active, other = (str(path) for path in audio_files[:2])
+
+    with cached_features(audio_files[0]) as cache:
+        assert cache is feature_cache._cache
+        first = transcribe_module.log_mel_spectrogram(active, n_mels=80, padding=0)
+        again = transcribe_module.log_mel_spectrogram(active, n_mels=80, padding=0)
+        assert original.calls == [active]  # Computed once, then served from the cache
+        assert np.array_equal(first.frames, again.frames)
+
+        transcribe_module.log_mel_spectrogram(other, n_mels=80, padding=0)
+        samples = np.zeros(16000, dtype=np.float32)
+        assert isinstance(transcribe_module.log_mel_spectrogram(samples, n_mels=80), np.ndarray)
+
+        thread = threading.Thread(target=transcribe_module.log_mel_spectrogram, args=(active,))
+        thread.start()
+        thread.join()
+        assert original.calls[1:] == [other, samples, active]
+
+    transcribe_module.log_mel_spectrogram(active, n_mels=80, padding=0)
+    assert len(original.calls) == 5
+
+
+def test_disabled_or_bypassed_cache_does_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_cache, "_cache", FeatureCache(tmp_path / "features"))
+    monkeypatch.setattr(feature_cache, "FEATURE_CACHE_ENABLED", False)
+    with cached_features("audio.wav") as cache:
+        assert cache is None
+
+    monkeypatch.setattr(feature_cache, "FEATURE_CACHE_ENABLED", True)
+    with feature_cache.bypass_feature_cache():
+        assert feature_cache.get_feature_cache() is None
+    assert feature_cache.get_feature_cache() is not None
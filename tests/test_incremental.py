@@ -0,0 +1,99 @@
+import hashlib
+import os
+import wave
+
+import numpy as np
+
+from feature_cache import get_feature_cache
+from incremental import HOP_LENGTH, ChunkTranscriptStore, open_pcm, shift_segment, transcribe_incremental
+
+SAMPLE_RATE = 16000
+
+
+class ChunkTranscriber:
+    """Stands in for RealtimeTranscriber: a segment every 5 s, its text derived from the audio."""
+
+    model_name = "test-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_with_updates(self, audio_path, mode="sentence", error_callback=None):
+        assert get_feature_cache() is None, "chunk audio must bypass the feature cache"
+        self.calls += 1
+        samples, sample_rate = open_pcm(audio_path)
+        segments = []
+        for start in range(0, len(samples) - sample_rate, 5 * sample_rate):
+            piece = samples[start:start + 5 * sample_rate].tobytes()
+            segments.append({
+                "start": start / sample_rate,
+                "end": min(start + 5 * sample_rate, len(samples)) / sample_rate,
+                "text": " " + hashlib.md5(piece).hexdigest()[:8],
+                "seek": start // HOP_LENGTH,
+            })
+        return {"language": "he", "segments": segments}
+
+
+def speech_like(seconds: int, seed: int = 1):
+    """Noise bursts separated by short pauses, so chunk cuts can snap to silence."""
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(seconds * SAMPLE_RATE) * 3000).astype("<i2")
+    for pause in range(0, seconds, 3):
+        samples[pause * SAMPLE_RATE:pause * SAMPLE_RATE + SAMPLE_RATE // 5] = 0
+    return samples
+
+
+def write_wav(path, samples):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+def test_shift_segment_moves_words_and_seek():
+    segment = {"start": 1.0, "end": 2.0, "seek": 100, "text": " a b",
+               "words": [{"word": " a", "start": 1.0, "end": 1.5}, {"word": " b", "start": 1.5, "end": 2.0}]}
+    shifted = shift_segment(segment, 60.0, 6000)
+
+    assert (shifted["start"], shifted["end"], shifted["seek"]) == (61.0, 62.0, 6100)
+    assert [(w["start"], w["end"]) for w in shifted["words"]] == [(61.0, 61.5), (61.5, 62.0)]
+    assert segment["start"] == 1.0 and segment["words"][0]["start"] == 1.0
+
+
+def test_trimmed_and_extended_file_reuses_unchanged_chunks(tmp_path):
+    original = speech_like(420)
+    store = ChunkTranscriptStore(tmp_path / "chunks")
+    first = transcribe_incremental(ChunkTranscriber(), write_wav(tmp_path / "v1.wav", original), store=store)
+    chunks = first["incremental"]["chunks"]
+    assert chunks >= 4 and first["incremental"]["reused_chunks"] == 0
+
+    # Trim 3 s from the start, insert 10 s in the middle
+    middle = len(original) // 2
+    edited = np.concatenate([original[3 * SAMPLE_RATE:middle], speech_like(10, seed=2), original[middle:]])
+    transcriber = ChunkTranscriber()
+    result = transcribe_incremental(transcriber, write_wav(tmp_path / "v2.wav", edited), store=store)
+
+    summary = result["incremental"]
+    # Only the chunks holding the two edits are transcribed again
+    assert summary["reused_chunks"] >= summary["chunks"] - 2
+    assert transcriber.calls == summary["chunks"] - summary["reused_chunks"]
+    # Same result as transcribing the edited file from scratch: reused segments moved to their new place
+    fresh = transcribe_incremental(ChunkTranscriber(), tmp_path / "v2.wav", store=ChunkTranscriptStore(tmp_path / "empty"))
+    assert result["segments"] == fresh["segments"]
+    assert [segment["id"] for segment in result["segments"]] == list(range(len(result["segments"])))
+    assert result["text"] == "".join(segment["text"] for segment in result["segments"])
+
+
+def test_store_evicts_least_recently_used(tmp_path):
+    store = ChunkTranscriptStore(tmp_path / "chunks", max_bytes=2000)
+    entry = {"language": "he", "segments": [{"start": 0, "end": 1, "text": "x" * 500}]}
+    for age, name in enumerate(("a", "b", "c")):
+        store.put("m", "sentence", name, entry)
+        os.utime(store._path("m", "sentence", name), (1000 + age, 1000 + age))
+    assert store.get("m", "sentence", "a") is not None  # Now the most recently used
+
+    store.put("m", "sentence", "d", entry)
+    store.evict()
+    assert [name for name in "abcd" if store.get("m", "sentence", name)] == ["a", "c", "d"]
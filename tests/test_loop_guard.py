@@ -0,0 +1,133 @@
+import random
+from pathlib import Path
+
+from loop_guard import RETRY_OPTIONS, LoopGuard, ScriptedBackend
+
+AUDIO = Path("audio.wav")  # Never opened by the scripted backend
+WINDOW = 10.0
+
+
+def speech(start: float, end: float) -> dict:
+    """A segment of ordinary, non-repetitive text."""
+    rng = random.Random(int(start * 1000))
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(6)) for _ in range(5)]
+    return {"start": start, "end": end, "text": " " + " ".join(words)}
+
+
+def normal_window(start: float, end: float) -> list:
+    """Segments every 2 s, the last one ending well before the window edge."""
+    segments = []
+    t = start
+    while t + 2 <= end - 1:
+        segments.append(speech(t, t + 2))
+        t += 2
+    return segments
+
+
+def is_retry(options: dict) -> bool:
+    return all(options.get(key) == value for key, value in RETRY_OPTIONS.items())
+
+
+def texts(result: dict) -> list:
+    return [segment["text"] for segment in result["segments"]]
+
+
+def test_looping_window_is_aborted_and_retried():
+    produced = []
+
+    def looping(start, end):
+        t = start
+        while t < end:
+            produced.append(t)
+            yield {"start": t, "end": t + 1, "text": " לה לה לה"}
+            t += 1
+
+    def script(start, end, options):
+        if start == 10 and not is_retry(options):
+            return looping(start, end)
+        return normal_window(start, end)
+
+    backend = ScriptedBackend(script)
+    result = LoopGuard(backend, WINDOW).transcribe(AUDIO, 30.0)
+
+    report = result["loop_guard"]
+    assert report["windows"] == 3
+    assert report["aborted_windows"] == 1
+    assert report["aborts"][0]["reason"] == "repeated segment"
+    assert report["aborts"][0]["start"] == 10
+    # Decoding stopped at the third repeat instead of running to the window end
+    assert len(produced) == 3
+
+    starts = [(start, is_retry(options)) for start, _, options in backend.calls]
+    assert starts == [(0.0, False), (10.0, False), (10.0, True), (20.0, False)]
+    assert " לה לה לה" not in texts(result)
+    assert texts(result) == [s["text"] for w in (0, 10, 20) for s in normal_window(w, w + WINDOW)]
+    assert [segment["id"] for segment in result["segments"]] == list(range(len(result["segments"])))
+
+
+def test_detector_is_resynced_after_dropped_segments():
+    junk = {"start": 16, "end": 19, "text": " נה" * 40}
+
+    def script(start, end, options):
+        if start == 10:
+            if is_retry(options):
+                # The retry still ends in repetitive junk, which is dropped
+                return [speech(10, 13), speech(13, 16), junk]
+            return [{"start": t, "end": t + 1, "text": " לה לה לה"} for t in range(10, 20)]
+        return normal_window(start, end)
+
+    result = LoopGuard(ScriptedBackend(script), WINDOW).transcribe(AUDIO, 30.0)
+
+    report = result["loop_guard"]
+    assert report["aborted_windows"] == 1
+    assert report["dropped_segments"] == 1
+    assert junk["text"] not in texts(result)
+    # The junk no longer counts as recent text, so the next window is not flagged
+    assert texts(result)[-len(normal_window(20, 30)):] == [s["text"] for s in normal_window(20, 30)]
+
+
+def test_segment_cut_at_window_edge_is_handed_to_next_window():
+    a, c, d, e, f = speech(0, 4), speech(4, 7), speech(10, 14), speech(14, 15), speech(17, 19)
+    cut = {**c, "start": 7, "end": 9.8}  # Same line again, cut off at the window edge
+
+    def script(start, end, options):
+        if start == 0:
+            return [a, c, cut]
+        if start == 7:
+            return [{**c, "start": 7, "end": 10}, d, e]
+        return [f]
+
+    backend = ScriptedBackend(script)
+    result = LoopGuard(backend, WINDOW).transcribe(AUDIO, 20.0)
+
+    assert [start for start, _, _ in backend.calls] == [0, 7, 17]
+    # The handed-off segment is observed once, so two equal lines are not a loop
+    assert result["loop_guard"]["aborted_windows"] == 0
+    assert texts(result) == [a["text"], c["text"], c["text"], d["text"], e["text"], f["text"]]
+    assert [segment["start"] for segment in result["segments"]] == [0, 4, 7, 10, 14, 17]
+
+
+def test_report_gives_retry_cost():
+    def script(start, end, options):
+        if start == 10 and not is_retry(options):
+            return [{"start": t, "end": t + 1, "text": " לה לה לה"} for t in range(10, 20)]
+        return normal_window(start, end)
+
+    result = LoopGuard(ScriptedBackend(script, realtime_factor=0.01), WINDOW).transcribe(AUDIO, 30.0)
+
+    report = result["loop_guard"]
+    assert "saved_seconds" not in report
+    # Aborted after 3 s of audio, retried over the whole window (8 s of segments)
+    assert 0.02 <= report["aborted_seconds"] < report["retry_seconds"]
+    assert report["retry_seconds"] >= 0.07
+
+
+def test_no_loops_no_retries():
+    backend = ScriptedBackend(lambda start, end, options: normal_window(start, end))
+    result = LoopGuard(backend, WINDOW).transcribe(AUDIO, 25.0)
+
+    report = result["loop_guard"]
+    assert report["windows"] == 3
+    assert report["aborted_windows"] == report["dropped_segments"] == 0
+    assert report["aborted_seconds"] == report["retry_seconds"] == 0
+    assert result["language"] == "he"
@@ -0,0 +1,114 @@
+import threading
+import time
+from contextlib import ExitStack
+
+import pytest
+
+from model_scheduler import RTF_MAX_STEP, RTF_SMOOTHING, ModelGate, ModelScheduler
+from config.settings import DEFAULT_REALTIME_FACTORS
+
+TINY = "mlx-community/whisper-tiny"
+TURBO = "mlx-community/whisper-large-v3-turbo"
+LARGE = "mlx-community/whisper-large-v3"
+
+
+def blend(measured, current):
+    return RTF_SMOOTHING * measured + (1 - RTF_SMOOTHING) * current
+
+
+def test_processes_share_measurements(tmp_path):
+    # Two schedulers on one file stand for the web UI and the API on one host
+    web = ModelScheduler(tmp_path / "model_stats.json", host="mac")
+    api = ModelScheduler(tmp_path / "model_stats.json", host="mac")
+    assert api.realtime_factor(TINY) == web.realtime_factor(TINY)
+
+    web.record(TINY, 100, 4)
+    tiny = blend(0.04, DEFAULT_REALTIME_FACTORS[TINY])
+    assert api.realtime_factor(TINY) == pytest.approx(tiny)
+
+    api.record(LARGE, 100, 40)
+    api.record(TINY, 100, 2)
+    # Neither write dropped the other's measurements
+    assert web.realtime_factor(LARGE) == pytest.approx(blend(0.4, DEFAULT_REALTIME_FACTORS[LARGE]))
+    assert web.realtime_factor(TINY) == pytest.approx(blend(0.02, tiny))
+
+    stats = ModelScheduler(tmp_path / "model_stats.json", host="mac")._load_stats()
+    assert {model: entry["samples"] for model, entry in stats["mac"].items()} == {TINY: 2, LARGE: 1}
+
+
+def test_outlier_moves_estimate_by_a_bounded_step(tmp_path):
+    scheduler = ModelScheduler(tmp_path / "model_stats.json", host="mac")
+    prior = DEFAULT_REALTIME_FACTORS[LARGE]
+
+    # A first run that included downloading the model: 30x slower than real time
+    scheduler.record(LARGE, 100, 3000)
+    assert scheduler.realtime_factor(LARGE) == pytest.approx(blend(prior * RTF_MAX_STEP, prior))
+    assert scheduler.realtime_factor(LARGE) < 2 * prior
+
+    # Normal runs bring it back down
+    for _ in range(10):
+        scheduler.record(LARGE, 100, 100 * prior)
+    assert scheduler.realtime_factor(LARGE) == pytest.approx(prior, rel=0.1)
+
+
+def test_choice_follows_load(tmp_path):
+    scheduler = ModelScheduler(tmp_path / "model_stats.json", host="mac")
+    # 100 s of audio in 20 s: large-v3 (0.3) doesn't fit unloaded, turbo (0.06) does
+    assert scheduler.choose_model(100, 20) == TURBO
+
+    with ExitStack() as jobs:
+        for _ in range(3):
+            jobs.enter_context(scheduler.track_job())
+        # Four jobs share the machine: only tiny fits
+        assert scheduler.active_jobs == 3
+        assert scheduler.choose_model(100, 20) == TINY
+        jobs.close()
+        assert scheduler.choose_model(100, 20) == TURBO
+
+    # With more time large-v3 fits, until one other job doubles its estimate
+    assert scheduler.choose_model(100, 50) == LARGE
+    assert scheduler.choose_model(100, 50, load=1) == TURBO
+    # Nothing fits: the fastest model
+    assert scheduler.choose_model(100, 1) == TINY
+
+
+def test_unwritable_stats_do_not_fail(tmp_path):
+    (tmp_path / "file").write_text("")
+    scheduler = ModelScheduler(tmp_path / "file" / "model_stats.json")
+    scheduler.record(TINY, 100, 10)
+    assert scheduler.choose_model(60, 1) == TINY
+
+
+def test_gate_runs_one_model_at_a_time_in_arrival_order():
+    gate = ModelGate()
+    order = []
+
+    def job(name, model, hold=None):
+        with gate.use(model, on_wait=lambda: order.append(f"{name} waits")):
+            order.append(name)
+            if hold:
+                hold.wait(5)
+
+    release_a = threading.Event()
+    a = threading.Thread(target=job, args=("a", TINY, release_a))
+    a.start()
+    while gate.active_jobs == 0:
+        time.sleep(0.001)
+    # Same model: runs alongside a
+    job("a2", TINY)
+
+    b = threading.Thread(target=job, args=("b", LARGE))
+    b.start()
+    while "b waits" not in order:
+        time.sleep(0.001)
+    # Another tiny job arrives after b: it must not overtake b
+    c = threading.Thread(target=job, args=("c", TINY))
+    c.start()
+    while "c waits" not in order:
+        time.sleep(0.001)
+
+    release_a.set()
+    for thread in (a, b, c):
+        thread.join(5)
+    assert order == ["a", "a2", "b waits", "c waits", "b", "c"]
+    assert gate.active_jobs == 0 and gate.model_name == TINY
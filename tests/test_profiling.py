@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+import tracemalloc
+
+from profiling import JobProfiler
+
+
+def test_concurrent_profiled_jobs_share_tracemalloc(tmp_path):
+    errors = []
+    first_done = threading.Event()
+
+    def job(name, wait_for=None):
+        try:
+            profiler = JobProfiler(tmp_path / name, sample_interval=0.005)
+            with profiler.stage("transcribe"):
+                data = [bytearray(1000) for _ in range(1000)]
+                if wait_for is not None:
+                    # Still inside the stage when the other job finishes
+                    wait_for.wait(5)
+                    time.sleep(0.02)
+                del data
+            profiler.finish()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            first_done.set()
+
+    second = threading.Thread(target=job, args=("b", first_done))
+    second.start()
+    time.sleep(0.02)
+    job("a")
+    second.join()
+
+    assert errors == []
+    assert not tracemalloc.is_tracing()
+    for name in "ab":
+        summary = json.loads((tmp_path / name / "summary.json").read_text())
+        assert summary["transcribe"]["shared"] is True
+        assert (tmp_path / name / "transcribe.alloc.txt").exists()
+
+
+def test_single_stage_owns_its_peak(tmp_path):
+    profiler = JobProfiler(tmp_path)
+    with profiler.stage("extract_audio"):
+        data = bytearray(5 * 1024 * 1024)
+        del data
+    assert profiler.summary["extract_audio"]["shared"] is False
+    assert profiler.summary["extract_audio"]["peak_traced_mb"] >= 4.9
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiling_errors_do_not_fail_the_stage(tmp_path):
+    profiler = JobProfiler(tmp_path / "job")
+    (tmp_path / "job").rmdir()  # Every profile write now fails
+    with profiler.stage("generate_srt"):
+        pass
+    profiler.finish()
+    assert not tracemalloc.is_tracing()
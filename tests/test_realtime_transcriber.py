@@ -0,0 +1,77 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import realtime_transcriber
+from realtime_transcriber import RealtimeTranscriber
+
+LONG_TEXT = " " + " ".join(["מילה"] * 30)  # Too long for one subtitle
+
+
+@pytest.fixture
+def aligned_windows(monkeypatch):
+    """Stub mlx modules; add_word_timestamps splits every segment of a window, like the real one."""
+    windows = []
+
+    def add_word_timestamps(segments, **kwargs):
+        windows.append([segment["text"] for segment in segments])
+        for segment in segments:
+            words = segment["text"].split()
+            step = (segment["end"] - segment["start"]) / len(words)
+            segment["words"] = [
+                {"word": " " + word, "start": segment["start"] + k * step, "end": segment["start"] + (k + 1) * step}
+                for k, word in enumerate(words)
+            ]
+
+    model = types.SimpleNamespace(is_multilingual=True, num_languages=100, dims=types.SimpleNamespace(n_mels=80))
+    modules = {
+        "mlx": types.ModuleType("mlx"),
+        "mlx.core": types.SimpleNamespace(float16=np.float16),
+        "mlx_whisper": types.ModuleType("mlx_whisper"),
+        "mlx_whisper.audio": types.SimpleNamespace(
+            HOP_LENGTH=160, N_FRAMES=3000, N_SAMPLES=480000,
+            load_audio=lambda path: np.zeros(16000 * 60, dtype=np.float32),
+            log_mel_spectrogram=lambda audio, n_mels, padding: np.zeros((3000 + len(audio) // 160, n_mels)),
+            pad_or_trim=lambda mel, length, axis: mel[:length],
+        ),
+        "mlx_whisper.timing": types.SimpleNamespace(add_word_timestamps=add_word_timestamps),
+        "mlx_whisper.tokenizer": types.SimpleNamespace(get_tokenizer=lambda *args, **kwargs: None),
+        "mlx_whisper.transcribe": types.SimpleNamespace(
+            ModelHolder=types.SimpleNamespace(get_model=lambda name, dtype: model)
+        ),
+    }
+    for name, module in modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.setattr(realtime_transcriber, "get_feature_cache", lambda: None)
+    return windows
+
+
+def one_window_result():
+    return {"language": "he", "segments": [
+        {"start": 0.0, "end": 12.0, "text": LONG_TEXT, "tokens": [1, 2, 3], "seek": 0},
+        {"start": 12.0, "end": 14.0, "text": " שלום עולם", "tokens": [4, 5], "seek": 0},
+        {"start": 30.0, "end": 32.0, "text": " עוד משפט", "tokens": [6], "seek": 3000},
+    ]}
+
+
+def test_only_long_segments_are_aligned_by_default(aligned_windows):
+    result = RealtimeTranscriber().align_words("audio.wav", one_window_result())
+
+    assert ["words" in segment for segment in result["segments"]] == [True, False, False]
+    # The window without a selected segment is not aligned at all
+    assert len(aligned_windows) == 1
+
+
+def test_aligning_on_demand_keeps_earlier_splits(aligned_windows):
+    transcriber = RealtimeTranscriber()
+    result = transcriber.align_words("audio.wav", one_window_result())
+    earlier_words = result["segments"][0]["words"]
+
+    transcriber.align_words("audio.wav", result, [1])
+
+    assert ["words" in segment for segment in result["segments"]] == [True, True, False]
+    assert result["segments"][0]["words"] is earlier_words
+    cues = transcriber.extract_segments(result, mode="word_lazy")
+    assert len(cues) == 30 + 2 + 1
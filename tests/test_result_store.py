@@ -0,0 +1,40 @@
+from result_store import ResultStore
+
+SRT = "1\n00:00:00,000 --> 00:00:02,000\nשלום\n\n2\n00:00:02,000 --> 00:00:04,000\nעולם\n"
+ALIGNMENT = {"language": "he", "segments": [{"start": 0, "end": 4, "text": " שלום עולם", "tokens": [1, 2], "seek": 0}]}
+
+
+def test_alignment_data_is_kept_only_when_given(tmp_path):
+    store = ResultStore(tmp_path / "results")
+    audio = tmp_path / "job_audio.wav"
+    audio.write_bytes(b"RIFF")
+
+    plain = store.save(SRT, "שלום עולם", [], "a.wav", mode="sentence")
+    alignable = store.save(SRT, "שלום עולם", [], "a.wav", audio_path=audio, alignment=ALIGNMENT, mode="word_lazy")
+
+    assert store.meta(plain)["alignable"] is False
+    assert store.alignment(plain) is None
+    assert store.meta(alignable)["alignable"] is True
+    audio_path, alignment = store.alignment(alignable)
+    assert not audio.exists() and audio_path.read_bytes() == b"RIFF"
+    assert alignment == ALIGNMENT
+
+
+def test_update_replaces_subtitles_and_cached_pieces(tmp_path):
+    store = ResultStore(tmp_path / "results")
+    audio = tmp_path / "job_audio.wav"
+    audio.write_bytes(b"RIFF")
+    handle = store.save(SRT, "שלום עולם", [], "a.wav", audio_path=audio, alignment=ALIGNMENT, mode="word_lazy")
+    assert store.meta(handle)["cue_count"] == 2
+    assert "שלום" in store.cues(handle, 0, 1)
+
+    aligned = {**ALIGNMENT, "segments": [{**ALIGNMENT["segments"][0], "words": [{"word": " שלום", "start": 0, "end": 2}]}]}
+    new_srt = "1\n00:00:00,000 --> 00:00:01,000\nעוד\n"
+    store.update(handle, new_srt, [{"start": 0, "end": 1, "text": "עוד"}], aligned)
+
+    meta = store.meta(handle)
+    assert meta["cue_count"] == 1
+    assert meta["mode"] == "word_lazy"
+    assert store.cues(handle, 0, 1) == "1\n00:00:00,000 --> 00:00:01,000\nעוד\n\n"
+    assert store.srt_bytes(handle).decode("utf-8") == "1\n00:00:00,000 --> 00:00:01,000\nעוד\n\n"
+    assert store.alignment(handle)[1] == aligned
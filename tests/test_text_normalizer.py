@@ -0,0 +1,56 @@
+from text_normalizer import RLM, Glossary, TextNormalizer
+
+
+def normalizer(entries=()):
+    normalizer = TextNormalizer(strip_niqqud=True, final_letters=True, rtl_punctuation=True)
+    normalizer.glossary = Glossary(entries, normalizer.normalize_hebrew)
+    return normalizer
+
+
+def test_final_letters():
+    assert normalizer().normalize(["שלומ לכמ", "מלךים", "ספר אחד"]) == ["שלום לכם", "מלכים", "ספר אחד"]
+
+
+def test_niqqud_stripped_but_maqaf_kept():
+    assert normalizer().normalize(["שָׁלוֹם", "בֵּית־סֵפֶר"]) == ["שלום", "בית־ספר"]
+
+
+def test_leftmost_longest_match():
+    glossary = [("open", "Open"), ("open ai", "OpenAI"), ("ai model", "AI-model")]
+    assert normalizer(glossary).normalize(["open ai model", "OPEN source", "an ai model"]) == [
+        "OpenAI model", "Open source", "an AI-model"
+    ]
+
+
+def test_multi_word_terms_match_within_a_cue_only():
+    glossary = [("צ'אט ג'יפיטי", "ChatGPT"), ("open ai", "OpenAI")]
+    assert normalizer(glossary).normalize(["שאלתי את צ'אט  ג'יפיטי.", "open", "ai"]) == [
+        "שאלתי את ChatGPT.", "open", "ai"
+    ]
+
+
+def test_glossary_terms_are_normalized_like_the_text():
+    assert normalizer([("חֲנוּכָּה", "Hanukkah")]).normalize(["חנוכה שמח"]) == ["Hanukkah שמח"]
+
+
+def test_prefixes_only_for_terms_that_allow_them():
+    glossary = [("גוגל", "Google", True), ("רון", "Ron"), ("לב", "Lev"), ("ירושלים", "ירושלים", True)]
+    assert normalizer(glossary).normalize(["חיפשתי בגוגל ושגוגל", "שרון הגיעה", "הכלב נבח", "רון ולב"]) == [
+        "חיפשתי ב-Google וש-Google", "שרון הגיעה", "הכלב נבח", "Ron ולב"
+    ]
+    # No hyphen before a Hebrew replacement
+    assert normalizer(glossary).normalize(["בירושלים"]) == ["בירושלים"]
+
+
+def test_glossary_file_prefix_column(tmp_path):
+    path = tmp_path / "glossary.csv"
+    path.write_text("# term,replacement,prefix\nגוגל,Google,prefix\nרון,Ron\nלב,Lev,no\n", encoding="utf-8")
+    glossary = Glossary.from_file(path)
+
+    assert len(glossary) == 3
+    assert glossary.apply("בגוגל שרון הכלב") == "ב-Google שרון הכלב"
+
+
+def test_rtl_mark_only_on_hebrew_lines():
+    assert normalizer().format_line("שלום.") == RLM + "שלום."
+    assert normalizer().format_line("Hello.") == "Hello."
@@ -0,0 +1,82 @@
+import json
+
+from text_normalizer import RLM
+from transcript_index import TranscriptIndex, build_match_query, index_worker_results, parse_srt
+
+
+def cue(index, start, text):
+    return {"index": index, "start": start, "end": start + 2, "text": text}
+
+
+def test_build_match_query():
+    assert build_match_query("ראש הממשלה") == '{text variants} : "ראש" AND {text variants} : "הממשלה"'
+    # Phrases match the text as written, not prefix-stripped variants
+    assert build_match_query('"ראש הממשלה"') == 'text : "ראש הממשלה"'
+    assert build_match_query("תמלול*") == '{text variants} : "תמלול" *'
+    # Gershayim keep an acronym together; niqqud and final letters are normalized like the index
+    assert build_match_query('צה"ל') == '{text variants} : "צה ל"'
+    assert build_match_query("שָׁלוֹמ") == '{text variants} : "שלום"'
+    # FTS5 syntax in the query is never passed through
+    assert build_match_query('  !! ""') is None
+    assert build_match_query("a OR NEAR(b)") == (
+        '{text variants} : "a" AND {text variants} : "OR" AND {text variants} : "NEAR b"'
+    )
+
+
+def test_parse_srt():
+    content = (
+        "1\r\n00:00:01,500 --> 00:00:03,000\r\n" + RLM + "שלום\r\nעולם\r\n\r\n"
+        "2\n00:01:00.250 --> 01:00:00.000\nsecond\n\n"
+        "garbage\n\n"
+        "00:02:00,000 --> 00:02:01,000\nno number\n\n"
+        "4\n00:03:00,000 --> 00:03:01,000\n\n"
+    )
+    assert parse_srt(content) == [
+        {"index": 1, "start": 1.5, "end": 3.0, "text": "שלום עולם"},
+        {"index": 2, "start": 60.25, "end": 3600.0, "text": "second"},
+        {"index": 3, "start": 120.0, "end": 121.0, "text": "no number"},
+    ]
+
+
+def test_replacing_and_deleting_a_transcript_updates_the_fts_index(tmp_path):
+    index = TranscriptIndex(tmp_path / "index.db")
+    index.add("web:a", "a.wav", [cue(1, 0, "בממשלה החדשה"), cue(2, 2, "שלום")])
+    index.add("web:b", "b.wav", [cue(1, 0, "שלום לכולם")])
+    assert [hit["source"] for hit in index.search("ממשלה")] == ["web:a"]
+
+    index.add("web:a", "a.wav", [cue(1, 0, "תקציב המדינה")])
+    assert index.search("ממשלה") == []
+    assert [hit["source"] for hit in index.search("שלום")] == ["web:b"]
+    assert [hit["text"] for hit in index.search("מדינה")] == ["תקציב המדינה"]
+    assert index.stats()["transcripts"] == 2
+
+    assert index.delete("web:a")
+    assert not index.delete("web:a")
+    assert index.search("מדינה") == []
+    assert [hit["source"] for hit in index.search("שלום")] == ["web:b"]
+    assert index.stats()["cues"] == 1
+    # No stale entries left in the contentless FTS table (searches join them away)
+    db = index._connect()
+    try:
+        fts_rows = db.execute("SELECT rowid FROM cues_fts WHERE cues_fts MATCH ?", (build_match_query("מדינה"),))
+        assert fts_rows.fetchall() == []
+        assert db.execute("SELECT COUNT(*) FROM cues_fts WHERE cues_fts MATCH 'שלום'").fetchone()[0] == 1
+    finally:
+        db.close()
+
+
+def test_worker_results_are_indexed_once(tmp_path):
+    index = TranscriptIndex(tmp_path / "index.db")
+    job_dir = tmp_path / "shared" / "results" / "job1"
+    job_dir.mkdir(parents=True)
+    (job_dir / "result.srt").write_text("1\n00:00:00,000 --> 00:00:02,000\n" + RLM + "שלום\n\n", encoding="utf-8")
+    (tmp_path / "shared" / "results" / "job2").mkdir()  # Still running: no result yet
+    assert index_worker_results(index, tmp_path / "shared") == (0, 0)
+
+    (job_dir / "result.json").write_text(json.dumps({"filename": "a.mp4", "duration": 2.0, "model": "m"}))
+    assert index_worker_results(index, tmp_path / "shared") == (1, 0)
+    assert index_worker_results(index, tmp_path / "shared") == (0, 1)
+
+    hit, = index.search("שלום")
+    assert (hit["source"], hit["filename"], hit["start_ms"], hit["end_ms"]) == ("worker:job1", "a.mp4", 0, 2000)
+    assert index.transcript(hit["transcript_id"])["meta"]["model"] == "m"
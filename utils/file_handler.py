@@ -1,14 +1,15 @@
 import os
-import tempfile
+import logging
 from pathlib import Path
 import hashlib
 from typing import Optional
-import streamlit as st
 
 from config.settings import TEMP_DIR, MAX_FILE_SIZE_MB
 
+logger = logging.getLogger(__name__)
 
-def save_uploaded_file(uploaded_file) -> Optional[Path]:
+
+def save_uploaded_file(uploaded_file, error_callback=None) -> Optional[Path]:
     """Save uploaded file to temporary directory."""
     if uploaded_file is None:
         return None
@@ -28,17 +29,17 @@ def save_uploaded_file(uploaded_file) -> Optional[Path]:
             f.write(uploaded_file.getbuffer())
         return temp_path
     except Exception as e:
-        st.error(f"שגיאה בשמירת הקובץ: {str(e)}")
+        (error_callback or logger.error)(f"שגיאה בשמירת הקובץ: {str(e)}")
         return None
 
 
-def cleanup_file(file_path: Path) -> None:
+def cleanup_file(file_path: Path, warning_callback=None) -> None:
     """Remove temporary file."""
     try:
         if file_path and file_path.exists():
             os.remove(file_path)
     except Exception as e:
-        st.warning(f"Could not clean up temporary file: {e}")
+        (warning_callback or logger.warning)(f"Could not clean up temporary file: {e}")
 
 
 def get_file_info(file_path: Path) -> dict: